@@ -0,0 +1,460 @@
+from core.utils.tools import tree_children
+from core.utils.contexts import Context
+from core.utils.expressions import Expression
+from core.interpreter.eval import evaluate
+from core.utils.tokens import (BasicToken, Function, Class, FunctionCall, VarAssign,
+                               Branch, ForLoop, WhileLoop, TryExceptBlock,
+                               ReturnStatement, BreakStatement, ContinueStatement,
+                               ImportStatement, PyimportStatement, ExecuteCode, EvaluateCode)
+from core.utils.keywords import EXEC_KEYWORD, EVAL_KEYWORD, IMPORT_KEYWORD
+from core.utils.tokentypes import (VARIABLE, PARENTHESIS, MATHEXPR, TUPLE, OPERATOR,
+                                   INTEGER, FLOAT, STRING, BOOL)
+
+"""
+Optimizations of blocks of statements:
+- dead code elimination: statements after return, break and continue are removed, as well
+  as arms of branches with constant false conditions, and loops that never run. Arm with
+  constant true condition is the last one, and if it is the first one, its code is
+  executed without a branch
+- jump tables: chain of branches, that compare the same variable to different constants,
+  chooses its branch by a lookup of the variable value in a dict
+- counted loops: for loop, that adds a constant to its integer counter, and compares it
+  to the same bound on every iteration, iterates a range, and assigns the counter directly
+- loop-invariant code motion: assignment, that assigns the same value on every iteration,
+  is executed once, before the first iteration (after the loop condition is checked first
+  time, so loop that does not run does not assign it)
+
+Dead code elimination and code motion are conservative: names true, false and null are constants only if nothing in the tree
+can reassign them, and nothing is moved out of a loop, that calls functions, executes code
+(exec, eval, imports), or catches exceptions, as any of them may see the difference
+"""
+
+LITERALS = INTEGER | FLOAT | STRING | BOOL
+CONSTANT_NAMES = ('true', 'false', 'null')
+COUNTER_COMPARISONS = ('<', '<=', '>', '>=')
+# shorter chains of branches are compared one by one
+MIN_JUMP_TABLE_BRANCHES = 3
+TERMINATORS = (ReturnStatement, BreakStatement, ContinueStatement)
+# keywords of code, that may assign any global
+DYNAMIC_KEYWORDS = EXEC_KEYWORD | EVAL_KEYWORD | IMPORT_KEYWORD
+# loops that contain one of these are left as they are by code motion
+IMPURE_CONSTRUCTIONS = (FunctionCall, ExecuteCode, EvaluateCode, ImportStatement,
+                        PyimportStatement, Function, Class, TryExceptBlock)
+
+
+class BlocksOptimizer:
+    def __init__(self, tree, changes, outer=None):
+        """
+        changes: list, description of every change is appended to
+        outer: optimizer of the tree, which function or class body the tree is
+        """
+
+        self.changes = changes
+        reads, writes = set(), {}
+        collect_names(tree, reads, writes, set())
+        lazy_dynamic, lazy_global_writes = scan_lazy_bodies(tree)
+        # executed and imported code may assign any global
+        self.dynamic = lazy_dynamic or contains(tree, (ExecuteCode, EvaluateCode, ImportStatement))
+        self.pyimported = {str(node.name) for node in walk_nodes(tree) if isinstance(node, PyimportStatement)}
+        # names, that functions assign by `global.name`
+        self.global_writes = lazy_global_writes | {root_name(node.name.value) for node in walk_nodes(tree)
+                                                   if isinstance(node, VarAssign) and is_global_name(node.name)}
+
+        if outer is not None:
+            self.dynamic |= outer.dynamic
+            self.pyimported |= outer.pyimported
+            self.global_writes |= outer.global_writes
+            writes.update(dict.fromkeys(set(CONSTANT_NAMES) - set(outer.constant_names), 1))
+
+        self.constant_names = () if self.dynamic else \
+            tuple(name for name in CONSTANT_NAMES if name not in writes and name not in self.global_writes)
+
+    def optimize(self, block, in_try=False):
+        """
+        optimizes block of statements in place. in_try is whether exceptions of the block
+        may be caught in the same scope
+        """
+
+        index = 0
+
+        while index < len(block):
+            statement = block[index]
+            replacement = self.optimize_statement(statement, in_try)
+
+            if replacement is not None:
+                block[index:index + 1] = replacement
+                continue    # replacement is optimized as a part of the block
+
+            if isinstance(statement, TERMINATORS) and index + 1 < len(block):
+                self.report(block[index + 1], 'removed unreachable code after '
+                            + type(statement).__name__.replace('Statement', '').lower())
+                del block[index + 1:]
+
+            index += 1
+
+    def optimize_statement(self, statement, in_try):
+        """
+        returns list of statements, the statement has to be replaced by, or None
+        """
+
+        # bodies, that are not parsed yet, are optimized when they are parsed
+        if isinstance(statement, Function) and statement.lazy_body is None:
+            self.optimize(statement.code)
+        elif isinstance(statement, Class) and statement.lazy_body is None:
+            # statements of class body are looked through by instances, so only methods are optimized
+            for member in statement.body:
+                if isinstance(member, Function) and member.lazy_body is None:
+                    self.optimize(member.code)
+        elif isinstance(statement, TryExceptBlock):
+            self.optimize(statement.code, in_try=True)
+            self.optimize(statement.errhandler, in_try)
+        elif isinstance(statement, Branch):
+            return self.optimize_branch(statement, in_try)
+        elif isinstance(statement, (ForLoop, WhileLoop)):
+            condition = statement.end if isinstance(statement, ForLoop) else statement.expr
+
+            if self.constant_truth(condition) is False:
+                self.report(statement, 'removed loop, that never runs')
+
+                return [statement.begin] if isinstance(statement, ForLoop) else []
+
+            self.optimize(statement.code, in_try)
+
+            if not in_try:
+                self.hoist_invariants(statement, condition)
+            if isinstance(statement, ForLoop):
+                self.compile_counter(statement)
+
+        return None
+
+    def optimize_branch(self, branch, in_try):
+        arms = []
+        else_leaf = branch.else_expr
+
+        for arm in [branch.if_expr] + branch.elif_exprs:
+            truth = self.constant_truth(arm.expr)
+
+            if truth is False:
+                self.report(arm.expr[0], 'removed branch with constant false condition')
+                continue
+
+            arms.append(arm)
+
+            if truth is True:
+                if else_leaf is not None:
+                    self.report(else_leaf, 'removed branch after constant true condition')
+
+                else_leaf = None
+                break
+
+        if arms and self.constant_truth(arms[0].expr) is True:
+            self.report(arms[0].expr[0], 'replaced branch with constant true condition by its code')
+
+            return arms[0].code
+        if not arms:
+            return [] if else_leaf is None else else_leaf.code
+
+        for leaf in arms + [else_leaf]:
+            if leaf is not None:
+                self.optimize(leaf.code, in_try)
+
+        branch.if_expr, branch.elif_exprs, branch.else_expr = arms[0], arms[1:], else_leaf
+        self.compile_jump_table(branch)
+
+        return None
+
+    def compile_jump_table(self, branch):
+        """
+        chain of branches, that compare the same variable to constants, gets a table of its
+        branches by constants, so the branch is found by a single lookup
+        """
+
+        arms = [branch.if_expr] + branch.elif_exprs
+
+        if len(arms) < MIN_JUMP_TABLE_BRANCHES:
+            return
+
+        subject = None
+        branches = {}
+
+        for arm in arms:
+            comparison = get_comparison(arm.expr)
+
+            if comparison is None or (subject is not None and comparison[0].value != subject.value):
+                return
+
+            subject, constant = comparison
+            # the first branch of equal constants is the one, that is chosen
+            branches.setdefault(constant.value, arm)
+
+        branch.jump_table = [subject.clone()], branches
+        self.report(arms[0].expr[0], f'compiled chain of {len(arms)} branches to a jump table')
+
+    def constant_truth(self, expression):
+        """
+        returns truth of the constant condition, or None if it is not a constant
+        """
+
+        if not isinstance(expression, Expression) or len(expression) != 1 \
+                or not self.is_constant(expression[0]):
+            return None
+
+        try:
+            return bool(evaluate(expression, Context()))
+        except Exception:
+            return None
+
+    def is_constant(self, token):
+        if type(token) is not BasicToken:
+            return False
+        if token.type & LITERALS:
+            return True
+        if token.type == VARIABLE:
+            return token.value in self.constant_names
+
+        return token.primary_type == PARENTHESIS and isinstance(token.value, list) \
+            and len(token.value) == 1 and self.is_constant(token.value[0])
+
+    def hoist_invariants(self, loop, condition):
+        if contains((loop.code, condition, getattr(loop, 'step', None)), IMPURE_CONSTRUCTIONS):
+            return
+
+        reads, writes = set(), {}
+        collect_names((loop.code, getattr(loop, 'step', None)), reads, writes, set())
+        hoisted = []
+        # names, read by statements that stay before the hoisted ones
+        read_before = set()
+
+        for statement in list(loop.code):
+            if not isinstance(statement, VarAssign) or not is_simple_name(statement.name) \
+                    or not self.is_pure(statement.value):
+                break
+
+            name = root_name(statement.name.value)
+            value_reads = set()
+            collect_names(statement.value, value_reads, {}, set())
+
+            if writes.get(name) == 1 and name not in read_before and name not in value_reads \
+                    and not value_reads & writes.keys():
+                self.report(statement, f'moved assignment of loop invariant to {name} out of the loop')
+                loop.code.remove(statement)
+                hoisted.append(statement)
+            else:
+                read_before |= value_reads
+
+        if hoisted:
+            loop.hoisted = (loop.hoisted or []) + hoisted
+
+    def compile_counter(self, loop):
+        """
+        loop `for (i = a; i < b; i = i + k)`, that does not assign i in its body, and which
+        bound b is the same on every iteration, counts i by a range. Calls of the body may
+        change i or names of b only by `global.name`, so these names must not be assigned so
+        """
+
+        begin, step = loop.begin, loop.step
+
+        if self.dynamic or not isinstance(begin, VarAssign) or not is_simple_name(begin.name) \
+                or not isinstance(loop.end, Expression) or not loop.end.operations:
+            return
+
+        name = root_name(begin.name.value)
+        counter, comparison, _ = loop.end.operations[-1]
+
+        # comparison has to be the last operation, and the first leaf - its left operand
+        if counter != 0 or comparison.value not in COUNTER_COMPARISONS:
+            return
+
+        counter_token = loop.end[0]
+        bound = Expression(loop.end[2:])
+        step_value = get_counter_step(step, name)
+
+        if not is_simple_name(counter_token) or root_name(counter_token.value) != name \
+                or counter_token.unary != '+' or counter_token.exclam or step_value is None \
+                or (step_value > 0) != (comparison.value in ('<', '<=')) or not self.is_pure(bound):
+            return
+
+        reads, writes = set(), {}
+        collect_names(bound, reads, {}, set())
+        collect_names((loop.code, loop.hoisted), set(), writes, set())
+
+        if name in writes or name in self.global_writes or name in reads or reads & writes.keys() \
+                or reads & self.global_writes:
+            return
+
+        loop.counter = begin.name.value, bound, step_value, comparison.value in ('<=', '>=')
+        self.report(loop, f'counted loop by {name}')
+
+    def is_pure(self, value):
+        """
+        value is pure, if it is evaluated to the same value, every time variables it reads
+        are not changed, and evaluating it changes nothing
+        """
+
+        if hasattr(value, 'primary_type') and value.type == MATHEXPR:
+            value = value.value
+
+        tokens = value if isinstance(value, list) else [value]
+
+        for token in tokens:
+            if type(token) is not BasicToken:
+                return False
+            if token.type == VARIABLE:
+                if token.exclam or not is_simple_name(token) or root_name(token.value) in self.pyimported:
+                    return False
+            elif token.primary_type == PARENTHESIS or token.type == MATHEXPR:
+                if not self.is_pure(token.value):
+                    return False
+            elif not token.type & LITERALS and token.primary_type != OPERATOR:
+                return False
+
+        return True
+
+    def report(self, node, change):
+        lineno = getattr(node, 'lineno', None)
+        self.changes.append(change if lineno is None else f'line {lineno}: {change}')
+
+
+def get_comparison(expression):
+    """
+    returns variable and constant, if expression is `variable == constant` or
+    `constant == variable`, else None
+    """
+
+    if not isinstance(expression, Expression) or len(expression) != 3:
+        return None
+
+    left, op, right = expression
+
+    if type(left) is not BasicToken or type(right) is not BasicToken or op.value != '==':
+        return None
+    if left.type & LITERALS:
+        left, right = right, left
+
+    if not is_simple_name(left) or left.unary != '+' or left.exclam \
+            or not right.type & LITERALS or right.exclam:
+        return None
+
+    return left, right
+
+
+def get_counter_step(step, name):
+    """
+    returns k, if step is `name = name + k`, `name = k + name` or `name = name - k`,
+    where k is an integer constant, else None
+    """
+
+    if not isinstance(step, VarAssign) or not is_simple_name(step.name) or root_name(step.name.value) != name:
+        return None
+
+    value = step.value
+
+    if type(value) is not BasicToken or value.type != MATHEXPR or len(value.value) != 3:
+        return None
+
+    left, op, right = value.value
+
+    if op.value == '+' and right.type == VARIABLE:
+        left, right = right, left
+    if op.value not in ('+', '-') or not is_simple_name(left) or root_name(left.value) != name \
+            or left.unary != '+' or left.exclam or right.type != INTEGER or right.exclam or not right.value:
+        return None
+
+    return right.value if op.value == '+' else -right.value
+
+
+def is_global_name(token):
+    return hasattr(token, 'primary_type') and token.type == VARIABLE and str(token.value).startswith('global.')
+
+
+def is_simple_name(token):
+    return hasattr(token, 'primary_type') and token.type == VARIABLE and '.' not in token.value
+
+
+def root_name(name):
+    first_name, _, path = str(name).partition('.')
+
+    return root_name(path) if first_name == 'global' and path else first_name
+
+
+def collect_names(node, reads, writes, visited):
+    """
+    collects names, that are read, and how many times every name is assigned
+    """
+
+    if id(node) in visited:
+        return
+
+    visited.add(id(node))
+
+    if isinstance(node, VarAssign):
+        name = node.name
+        names = name.value if hasattr(name, 'primary_type') and name.type == TUPLE else [name]
+
+        for var in names:
+            if hasattr(var, 'primary_type') and var.type == VARIABLE:
+                writes[root_name(var.value)] = writes.get(root_name(var.value), 0) + 1
+
+        return collect_names(node.value, reads, writes, visited)
+    elif isinstance(node, (Function, Class, ImportStatement, PyimportStatement)):
+        writes[root_name(node.name)] = writes.get(root_name(node.name), 0) + 1
+    elif isinstance(node, BasicToken) and node.type == VARIABLE:
+        reads.add(root_name(node.value))
+    elif isinstance(node, FunctionCall):
+        reads.add(root_name(node.name))
+
+    for child in tree_children(node):
+        collect_names(child, reads, writes, visited)
+
+
+def scan_lazy_bodies(tree):
+    """
+    returns whether bodies of the tree, that are not parsed yet, may execute code or import
+    modules, and names they may assign by `global.name`. Their tokens are looked through, as
+    parsing them is what is avoided
+    """
+
+    global_writes = set()
+    dynamic = False
+
+    for node in walk_nodes(tree):
+        if isinstance(node, (Function, Class)) and node.lazy_body is not None:
+            dynamic |= scan_tokens(node.lazy_body.tokens, global_writes)
+
+    return dynamic, global_writes
+
+
+def scan_tokens(tokens, global_writes):
+    dynamic = False
+
+    for token in tokens:
+        if isinstance(token, list):     # items of collections are lists of tokens
+            dynamic |= scan_tokens(token, global_writes)
+            continue
+
+        if token.type & DYNAMIC_KEYWORDS:
+            dynamic = True
+        elif token.type == VARIABLE and str(token.value).startswith('global.'):
+            global_writes.add(root_name(token.value))
+        elif isinstance(token.value, list):
+            dynamic |= scan_tokens(token.value, global_writes)
+
+    return dynamic
+
+
+def walk_nodes(node, visited=None):
+    if visited is None:
+        visited = set()
+
+    if id(node) in visited:
+        return
+
+    visited.add(id(node))
+    yield node
+
+    for child in tree_children(node):
+        yield from walk_nodes(child, visited)
+
+
+def contains(node, types):
+    return any(isinstance(child, types) for child in walk_nodes(node))
@@ -0,0 +1,439 @@
+from core.utils.contexts import LocalName
+from core.utils.expressions import Expression, SHORT_CIRCUIT_OPERATORS
+from core.utils.tokens import (BasicToken, Function, Class, FunctionCall, VarAssign,
+                               Branch, ForLoop, WhileLoop, TryExceptBlock, DeleteTemporary)
+from core.utils.tokentypes import VARIABLE, PARENTHESIS, MATHEXPR, TUPLE, POWER
+from core.interpreter.blocks import LITERALS, root_name, walk_nodes, contains
+from core.interpreter.inliner import copy_token
+
+"""
+Common subexpression elimination: pure subexpression, that is evaluated more than once
+by the same values of names it reads, is evaluated once.
+- in an expression: repeated operation is evaluated once, and its value is used by all
+  of its operations. Repeated name, attribute path or parenthesized expression is evaluated
+  before the operations (Expression.shared), instead of every time it is an operand
+- in a block: operation, that is repeated by consecutive assignments, is assigned to a
+  temporary name right before the first of them, and they read the name instead. Names of
+  temporaries can't be written in the source, so nothing else reads or assigns them.
+  Temporary of the main program or a module is deleted after the last assignment, that
+  reads it, temporaries of functions are locals of the call
+
+Subexpression is pure, if it consists of names, literals and operators only. Expressions,
+that call functions, are left as they are, and call or any statement, that is not an
+assignment, ends a block. Assignment ends reuse of values, that read the name it assigns,
+and assignment of an attribute ends reuse of all values, that read attributes, as it may
+be an attribute of any object. Values, that are seen as objects (operands of `===`, `!==`,
+values of `&&` and `||`, assigned values), are evaluated every time, so an object is not
+shared where it was not. Right operand of `&&` or `||` may be not evaluated at all, so it
+uses values, that are evaluated anyway, but nothing else uses its values
+"""
+
+# operators, which value is one of the operands
+PASSING_OPERATORS = ('&&', '||')
+IDENTITY_OPERATORS = ('===', '!==')
+TEMPORARY_NAME = 'common@{}'
+
+
+class CommonSubexpressions:
+    def __init__(self, changes, pyimported):
+        """
+        pyimported: names of python modules, which attributes may be evaluated differently every time
+        """
+
+        self.changes = changes
+        self.pyimported = pyimported
+        self.temporaries = 0
+
+    def eliminate(self, tree, owner=None):
+        """
+        eliminates common subexpressions of the tree in place
+
+        owner: function or class, which body the tree is
+        """
+
+        if owner is None:
+            self.eliminate_block(tree, None, in_try=False)
+        else:
+            self.eliminate_statement(owner, None, in_try=False)
+
+        for node in walk_nodes(tree):
+            if isinstance(node, Expression):
+                self.share_values(node)
+
+    def eliminate_block(self, block, function, in_try):
+        """
+        function: function, which locals the temporaries are, or None if they are
+        variables of the context the block is executed in
+        """
+
+        for statement in block:
+            self.eliminate_statement(statement, function, in_try)
+
+        # exception of the first value may be caught after it is assigned
+        if not in_try:
+            while self.share_between_statements(block, function):
+                pass
+
+    def eliminate_statement(self, statement, function, in_try):
+        # bodies, that are not parsed yet, are eliminated when they are parsed
+        if isinstance(statement, Function) and statement.lazy_body is None:
+            self.eliminate_block(statement.code, statement, in_try=False)
+        elif isinstance(statement, Class) and statement.lazy_body is None:
+            # temporaries of class body would be seen as attributes of instances, so only methods are eliminated
+            for member in statement.body:
+                if isinstance(member, Function) and member.lazy_body is None:
+                    self.eliminate_block(member.code, member, in_try=False)
+        elif isinstance(statement, TryExceptBlock):
+            self.eliminate_block(statement.code, function, in_try=True)
+            self.eliminate_block(statement.errhandler, function, in_try)
+        elif isinstance(statement, Branch):
+            for leaf in [statement.if_expr, *statement.elif_exprs, statement.else_expr]:
+                if leaf is not None:
+                    self.eliminate_block(leaf.code, function, in_try)
+        elif isinstance(statement, (ForLoop, WhileLoop)):
+            self.eliminate_block(statement.code, function, in_try)
+
+    def share_values(self, expression):
+        """
+        makes operations of the expression use values of the same subexpressions once
+        """
+
+        leaves = expression.leaves
+
+        if leaves is None or not expression.operations or contains(expression, FunctionCall):
+            return
+
+        keys = [get_key(leaf, self.pyimported) for leaf in leaves]
+        fixed = get_fixed_values(expression) | get_short_circuit_values(expression)
+        # values, that may be not evaluated, use values, that are evaluated anyway, but not vice versa
+        conditional = get_conditional_values(expression)
+        # key: index of the value, that is used instead of values with the same key
+        indexes = {}
+        # index of value: index of the value, that is used instead of it
+        replacements = list(range(len(leaves)))
+
+        for index, (leaf, key) in enumerate(zip(leaves, keys)):
+            if key is not None and index not in fixed \
+                    and (leaf.type & (VARIABLE | MATHEXPR) or leaf.primary_type == PARENTHESIS):
+                if index in conditional:
+                    replacements[index] = indexes.get(key, index)
+                else:
+                    replacements[index] = indexes.setdefault(key, index)
+
+        operations = []
+
+        for index, (left, op, right) in enumerate(expression.operations, len(leaves)):
+            key = None if keys[left] is None or keys[right] is None else ('op', op.value, keys[left], keys[right])
+            keys.append(key)
+
+            if key in indexes and index not in fixed:
+                replacements.append(indexes[key])
+                continue
+
+            operations.append((replacements[left], op, replacements[right]))
+            replacements.append(len(leaves) + len(operations) - 1)
+
+            if key is not None and index not in fixed and index not in conditional:
+                indexes[key] = replacements[-1]
+
+        uses = {}
+
+        for left, _, right in operations:
+            uses[left] = uses.get(left, 0) + 1
+            uses[right] = uses.get(right, 0) + 1
+
+        # nested expressions are evaluated before the operations anyway
+        shared = [index for index, leaf in enumerate(leaves) if uses.get(index, 0) > 1 and leaf.type != MATHEXPR]
+        nested = [index for index in expression.nested if replacements[index] == index]
+        removed = len(expression.operations) - len(operations) + len(expression.nested) - len(nested)
+
+        if not removed and not shared:
+            return
+
+        if expression.jumps is not None:
+            expression.jumps = move_jumps(expression.jumps, replacements, len(leaves))
+
+        expression.operations, expression.nested, expression.shared = operations, nested, shared
+        self.report(leaves[0], 'evaluated common subexpressions once')
+
+    def share_between_statements(self, block, function):
+        """
+        assigns the largest subexpression, that is repeated by consecutive assignments,
+        to a temporary. Returns whether it is found
+        """
+
+        subexpressions = [find_subexpressions(statement, self.pyimported) if is_pure_assignment(statement)
+                          else None for statement in block]
+        common = None
+
+        for first, found in enumerate(subexpressions):
+            for key, size, *_ in found or ():
+                if common is not None and size <= common[1]:
+                    continue
+
+                occurrences = [occurrence for occurrence in found if occurrence[0] == key]
+                own_occurrences = len(occurrences)
+                reads = get_reads(key)
+                index = last = first
+
+                while not kills(block[index], reads) and index + 1 < len(block) \
+                        and subexpressions[index + 1] is not None:
+                    index += 1
+                    found_here = [occurrence for occurrence in subexpressions[index] if occurrence[0] == key]
+
+                    if found_here:
+                        occurrences.extend(found_here)
+                        last = index
+
+                if len(occurrences) > own_occurrences:
+                    common = key, size, first, last, occurrences
+
+        if common is None:
+            return False
+
+        _, _, first, last, occurrences = common
+        _, _, expression, start, end = occurrences[0]
+        statement = block[first]
+        context = expression[start * 2].context
+        name = self.new_temporary(function)
+        value = Expression([copy_token(token) for token in expression[start * 2:end * 2 + 1]])
+        block.insert(first, VarAssign(statement.evaluator, BasicToken(context, VARIABLE, name, lineno=statement.lineno),
+                                      BasicToken(context, MATHEXPR, value, lineno=statement.lineno),
+                                      statement.lineno))
+
+        # the last occurrences are replaced first, so spans of the first ones are not moved
+        for _, _, expression, start, end in sorted(occurrences, key=lambda occurrence: -occurrence[3]):
+            expression[start * 2:end * 2 + 1] = [BasicToken(context, VARIABLE, name, lineno=statement.lineno)]
+            expression.compile()
+
+        if function is None:
+            # the last statement, that reads the temporary, is moved by the assignment of it
+            block.insert(last + 2, DeleteTemporary(name, block[last + 1].lineno))
+
+        self.report(statement, f'assigned common subexpression, used {len(occurrences)} times, to a temporary')
+
+        return True
+
+    def new_temporary(self, function):
+        name = TEMPORARY_NAME.format(self.temporaries)
+        self.temporaries += 1
+
+        if function is None or function.local_names is None:
+            return name
+
+        function.local_names[name] = len(function.local_names)
+
+        return LocalName(name, function.local_names[name])
+
+    def report(self, node, change):
+        lineno = getattr(node, 'lineno', None)
+        self.changes.append(change if lineno is None else f'line {lineno}: {change}')
+
+
+def get_key(token, pyimported):
+    """
+    returns key, that is the same for tokens, that are evaluated to the same value by the
+    same values of names, or None, if token is not pure
+    """
+
+    if type(token) is not BasicToken:
+        return None
+    if token.type == VARIABLE:
+        if not isinstance(token.value, str) or root_name(token.value) in pyimported:
+            return None
+
+        return 'name', str(token.value), token.unary, token.exclam
+    if token.type & LITERALS:
+        return 'literal', token.type, token.value, token.unary, token.exclam
+    if (token.primary_type == PARENTHESIS or token.type == MATHEXPR) and isinstance(token.value, Expression):
+        key = get_expression_key(token.value, pyimported)
+
+        return None if key is None else ('group', token.type, token.unary, token.exclam, key)
+
+    return None
+
+
+def get_expression_key(expression, pyimported):
+    if expression.leaves is None:
+        return None
+
+    keys = [get_key(leaf, pyimported) for leaf in expression.leaves]
+
+    for left, op, right in expression.operations:
+        keys.append(None if keys[left] is None or keys[right] is None else ('op', op.value, keys[left], keys[right]))
+
+    return keys[-1]
+
+
+def get_fixed_values(expression):
+    """
+    returns indexes of values, which are evaluated by their operations on their own: operands
+    of power are evaluated with their unaries in a different way, and objects of identity
+    operands are compared
+    """
+
+    return {index for left, op, right in expression.operations
+            if op.type == POWER or op.value in IDENTITY_OPERATORS for index in (left, right)}
+
+
+def get_short_circuit_values(expression):
+    """
+    returns indexes of values of `&&` and `||` and of operations, they are operands of. They are
+    not shared, as operations of the right operand are skipped only by their own `&&` or `||`
+    """
+
+    values = set()
+
+    for index, (left, op, right) in enumerate(expression.operations, len(expression.leaves)):
+        if op.value in SHORT_CIRCUIT_OPERATORS or left in values or right in values:
+            values.add(index)
+
+    return values
+
+
+def move_jumps(jumps, replacements, leaves_count):
+    """
+    returns jumps (see Expression.jumps) of the operations, that are left, when the repeated
+    ones are removed. `&&` and `||` are not removed, and operations are not moved
+
+    replacements: index of value: index of the value, that is used instead of it
+    """
+
+    # number of operations, that are left before every operation
+    left_before = [0]
+
+    for index in range(leaves_count, len(replacements)):
+        left_before.append(left_before[-1] + (replacements[index] == leaves_count + left_before[-1]))
+
+    moved = {}
+
+    # right operands, that are left empty, start at the same position, so the outer ones go first anyway
+    for start in sorted(jumps):
+        moved.setdefault(left_before[start], []).extend(
+            (left_before[end], replacements[left], [index for index in evaluated if replacements[index] == index])
+            for end, left, evaluated in jumps[start])
+
+    return moved
+
+
+def get_conditional_values(expression):
+    """
+    returns indexes of values of right operands of `&&` and `||`
+    """
+
+    conditional = set()
+
+    for index in range(len(expression.operations) - 1, -1, -1):
+        left, op, right = expression.operations[index]
+
+        if len(expression.leaves) + index in conditional:
+            conditional.update((left, right))
+        elif op.value in SHORT_CIRCUIT_OPERATORS:
+            conditional.add(right)
+
+    return conditional
+
+
+def find_subexpressions(statement, pyimported):
+    """
+    returns list of key, size, expression, first and last leaves of every operation of
+    the assigned value, which value may be shared
+    """
+
+    found = []
+    find_operations(statement.value.value, True, pyimported, found)
+
+    return found
+
+
+def find_operations(expression, seen, pyimported, found):
+    """
+    seen: whether value of the expression is seen as an object
+    """
+
+    leaves = expression.leaves
+
+    if leaves is None:
+        return
+
+    keys = [get_key(leaf, pyimported) for leaf in leaves]
+    spans = [(index, index) for index in range(len(leaves))]
+    fixed = get_fixed_values(expression)
+    conditional = get_conditional_values(expression)
+    # value of the operation is seen, if it is passed to a value, that is seen
+    seen_values = [False] * (len(leaves) + len(expression.operations))
+    seen_values[-1] = seen
+
+    for index in range(len(expression.operations) - 1, -1, -1):
+        left, op, right = expression.operations[index]
+
+        if seen_values[len(leaves) + index] and op.value in PASSING_OPERATORS:
+            seen_values[left] = seen_values[right] = True
+
+    for index, (left, op, right) in enumerate(expression.operations, len(leaves)):
+        key = None if keys[left] is None or keys[right] is None else ('op', op.value, keys[left], keys[right])
+        keys.append(key)
+        spans.append((spans[left][0], spans[right][1]))
+
+        if key is not None and not seen_values[index] and index not in fixed and index not in conditional:
+            found.append((key, get_size(key), expression, *spans[-1]))
+
+    for index, leaf in enumerate(leaves):
+        if index in conditional:
+            continue
+        if (leaf.primary_type == PARENTHESIS or leaf.type == MATHEXPR) and isinstance(leaf.value, Expression):
+            # unary and exclam of parentheses are applied to the value of the expression itself
+            leaf_seen = seen_values[index] or index in fixed or leaf.unary != '+' or leaf.exclam
+            find_operations(leaf.value, leaf_seen, pyimported, found)
+
+
+def is_pure_assignment(statement):
+    if not isinstance(statement, VarAssign) or type(statement.value) is not BasicToken \
+            or statement.value.type != MATHEXPR or not isinstance(statement.value.value, Expression):
+        return False
+
+    name = statement.name
+    names = name.value if hasattr(name, 'primary_type') and name.type == TUPLE else [name]
+
+    return all(hasattr(var, 'primary_type') and var.type == VARIABLE for var in names) \
+        and not contains(statement.value, FunctionCall)
+
+
+def kills(statement, reads):
+    """
+    returns whether statement may assign something, that one of the reads reads
+    """
+
+    if not isinstance(statement, VarAssign):
+        return True
+
+    name = statement.name
+    names = [str(var.value) for var in (name.value if name.type == TUPLE else [name])]
+    roots = {root_name(var) for var in names}
+    assigns_attribute = any('.' in var.removeprefix('global.') for var in names)
+
+    return any(root_name(read) in roots or (assigns_attribute and '.' in read) for read in reads)
+
+
+def get_reads(key):
+    if key[0] == 'name':
+        return {key[1]}
+    if key[0] == 'op':
+        return get_reads(key[2]) | get_reads(key[3])
+    if key[0] == 'group':
+        return get_reads(key[4])
+
+    return set()
+
+
+def get_size(key):
+    """
+    returns number of operations of the key
+    """
+
+    if key[0] == 'op':
+        return 1 + get_size(key[2]) + get_size(key[3])
+    if key[0] == 'group':
+        return get_size(key[4])
+
+    return 0
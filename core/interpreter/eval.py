@@ -1,44 +1,266 @@
 from core.utils.tools import create_token
+from core.utils.expressions import Expression, SHORT_CIRCUIT_OPERATORS
 from core.utils.operators import executors
 from core.utils.tokens import BasicToken, ClassInstance
+from core.utils.datatypes_classes import List, Dict
 from core.utils.tokentypes import (OPERATOR, FCALL, POWER,
                                    PARENTHESIS, VARIABLE,
                                    pytypes2lotus, CLASSINSTANCE,
-                                   LIST, DICT, TUPLE, MATHEXPR)
+                                   COLLECTIONS, MATHEXPR, LIST)
+
+NEEDS_EVALUATION = PARENTHESIS | FCALL | VARIABLE
+# classes of collections, that are parsed from literals
+COLLECTION_LITERALS = (List, Dict)
+# types of values of operations, that are seen by the next operation as they are, so they
+# are boxed into a token only when the value of expression is
+UNBOXED_TYPES = frozenset(pytypes2lotus)
 
 
 def evaluate(tokens, context: dict = None, return_token=False):
     if context is None:
         context = {}
 
-    stack = tokens[:]
+    if type(tokens) is list and len(tokens) == 1 and hasattr(tokens[0], 'primary_type') \
+            and not tokens[0].primary_type & OPERATOR:
+        # single operand (for example, assigned value) is not worth compiling
+        result = evaluate_single(evaluate_leaf(tokens[0], context), context)
+    else:
+        if not isinstance(tokens, Expression):
+            tokens = Expression(tokens)
+
+        if tokens.leaves is not None and tokens.operations:
+            value = evaluate_operations(tokens, context)
+
+            if not return_token and type(value) in UNBOXED_TYPES:
+                return value
+
+            result = evaluate_single(create_token(context, BasicToken, ClassInstance, value), context)
+        elif tokens.leaves is not None:
+            result = evaluate_expression(tokens, context)
+        elif not all(hasattr(tokens[0], attr) for attr in ('type', 'primary_type')):
+            return tokens[0]  # this is not our token
+        else:
+            result = evaluate_stack(tokens[:], context)
+
+    if return_token or result.type & COLLECTIONS:
+        return result
+
+    return result.value
+
+
+def evaluate_expression(expression, context):
+    """
+    evaluates compiled expression to a token
+    """
+
+    if not expression.operations:
+        return evaluate_single(evaluate_leaves(expression, context)[0], context)
+
+    return evaluate_single(create_token(context, BasicToken, ClassInstance,
+                                        evaluate_operations(expression, context)), context)
+
+
+def evaluate_leaves(expression, context):
+    """
+    returns leaves of compiled expression, where nested expressions, function calls and
+    shared leaves are evaluated
+    """
+
+    values = expression.leaves[:]
+
+    for index in expression.nested:
+        values[index] = evaluate_leaf(values[index], context)
+
+    for index in expression.calls:
+        values[index] = evaluate_leaf(values[index], context)
+
+    for index in expression.shared:
+        values[index] = process_token(values[index], context)
+
+    return values
+
+
+def evaluate_operations(expression, context):
+    """
+    evaluates operations of compiled expression in their order and returns value of the last
+    one. Values of operations are python values, they are not boxed into tokens
+    """
+
+    values = evaluate_leaves(expression, context)
+
+    if expression.jumps is not None:
+        return evaluate_short_circuit(expression, values, context)
+
+    leaves_count = len(values)
+    result = None
+
+    for left, op, right in expression.operations:
+        if op.type == POWER:
+            result = pow_value(get_operand_token(values, left, leaves_count, context),
+                               get_operand_token(values, right, leaves_count, context), context)
+        else:
+            left_value, right_value = values[left], values[right]
+
+            if left < leaves_count:
+                left_value = process_value(left_value, context)
+            elif type(left_value) not in UNBOXED_TYPES:
+                left_value = unbox(left_value, context)
+
+            if right < leaves_count:
+                right_value = process_value(right_value, context)
+            elif type(right_value) not in UNBOXED_TYPES:
+                right_value = unbox(right_value, context)
+
+            result = executors[op.value](left_value, right_value)
+
+        values.append(result)
+
+    return result
+
+
+def evaluate_short_circuit(expression, values, context):
+    """
+    evaluates operations of the expression with `&&` or `||`: when the left operand decides the
+    value, operations of the right one are skipped, and the left one is the value
+    """
+
+    operations, jumps = expression.operations, expression.jumps
+    leaves_count = len(values)
+    result = None
+    position = 0
+
+    while position < len(operations):
+        for end, left, evaluated in jumps.get(position, ()):
+            left_value = get_operand(values, left, leaves_count, context)
+
+            # `&&` is decided by false, `||` - by true
+            if bool(left_value) == (operations[end][1].value == '||'):
+                values.extend([None] * (end - position))
+                values.append(left_value)
+                result = left_value
+                position = end + 1
+                break
+
+            for index in evaluated:
+                values[index] = evaluate_leaf(values[index], context)
+        else:
+            left, op, right = operations[position]
+
+            if op.value in SHORT_CIRCUIT_OPERATORS:
+                # the left operand did not decide the value, so it is the right one
+                result = get_operand(values, right, leaves_count, context)
+            elif op.type == POWER:
+                result = pow_value(get_operand_token(values, left, leaves_count, context),
+                                   get_operand_token(values, right, leaves_count, context), context)
+            else:
+                result = executors[op.value](get_operand(values, left, leaves_count, context),
+                                             get_operand(values, right, leaves_count, context))
+
+            values.append(result)
+            position += 1
+
+    return result
+
+
+def get_operand(values, index, leaves_count, context):
+    """
+    returns python value of the operand: leaves are tokens, values of operations are not
+    """
+
+    value = values[index]
+
+    if index < leaves_count:
+        return process_value(value, context)
+    if type(value) in UNBOXED_TYPES:
+        return value
+
+    return unbox(value, context)
+
+
+def get_operand_token(values, index, leaves_count, context):
+    if index < leaves_count:
+        return values[index]
+
+    return create_token(context, BasicToken, ClassInstance, values[index])
+
 
-    if not all(hasattr(stack[0], attr) for attr in ('type', 'primary_type')):
-        return stack[0]  # this is not our token
+def unbox(value, context):
+    """
+    returns value of operation, the way the next operation sees it (for example, collection
+    is seen as its items)
+    """
+
+    return process_token(create_token(context, BasicToken, ClassInstance, value), context).value
+
+
+def evaluate_leaf(token, context):
+    if token.type == MATHEXPR:
+        return evaluate(token.value, context=context, return_token=True)
+    if token.primary_type == FCALL:
+        return evaluate_op(token, context)
+
+    return token
+
+
+def evaluate_single(token, context):
+    while token.primary_type & NEEDS_EVALUATION:
+        if token.primary_type == PARENTHESIS:
+            if type(token.value) is list:
+                token.value = Expression(token.value)  # compiled once, when it is evaluated first time
+
+            result = evaluate(token.value, context=context, return_token=True)
+            token = apply_token_unary(process_token_exclam(result, token), token.unary)
+        else:
+            token = evaluate_op(token, context)
+
+    if type(token) in COLLECTION_LITERALS and token.literal:
+        # every evaluation of a literal makes a new collection, as it is changed by its methods.
+        # Collections, that are values, are not copied, so they are shared by their references
+        return copy_literal(token)
+
+    return token
+
+
+def copy_literal(collection):
+    """
+    returns copy of a list or dict literal, where nested collections are copied too, as
+    they are parts of the same literal
+    """
+
+    copy = collection.copy()
+    copy.literal = False
+
+    if copy.type == LIST:
+        copy.value = [copy_literal(item) if type(item) in COLLECTION_LITERALS else item for item in copy.value]
+    else:
+        copy.value = {key: copy_literal(value) if type(value) in COLLECTION_LITERALS else value
+                      for key, value in copy.value.items()}
+
+    return copy
+
+
+def evaluate_stack(stack, context):
+    """
+    evaluates tokens, that are not operands separated by operators, reducing them one by one
+    """
 
     for index, token in enumerate(stack):
         if token.type == MATHEXPR:
             result = evaluate(token.value, context=context, return_token=True)
             stack[index] = result
 
-    while len(stack) > 1 or (stack and stack[0].primary_type in (PARENTHESIS, FCALL, VARIABLE)):
+    while len(stack) > 1 or (stack and stack[0].primary_type & NEEDS_EVALUATION):
         op, op_start, op_end = get_op(stack)
 
         if hasattr(op, 'primary_type') and op.primary_type == PARENTHESIS:
             result = evaluate(op.value, context=context, return_token=True)
-            process_token_exclam(result, op)
-            apply_token_unary(result, op.unary)
+            result = apply_token_unary(process_token_exclam(result, op), op.unary)
         else:
             result = evaluate_op(op, context)
 
         stack[op_start:op_end] = [result]
 
-    unpack_stack = stack[0]
-
-    if return_token or unpack_stack.type in (LIST, DICT, TUPLE):
-        return unpack_stack
-
-    return unpack_stack.value
+    return stack[0]
 
 
 def get_op(tokens):
@@ -71,10 +293,8 @@ def evaluate_op(op, context):
         function_response = first.execute(context)
         function_response_as_token = create_token(context, BasicToken, ClassInstance, function_response,
                                                   unary=first.unary, exclam=first.exclam)
-        process_token_exclam(function_response_as_token)
-        apply_token_unary(function_response_as_token)
 
-        return function_response_as_token
+        return apply_token_unary(process_token_exclam(function_response_as_token))
     elif len(op) == 1:
         if first.primary_type == PARENTHESIS:
             first = evaluate(first.value, context, return_token=True)
@@ -83,6 +303,10 @@ def evaluate_op(op, context):
 
     left, op, right = op
 
+    return evaluate_binary_op(left, op, right, context)
+
+
+def evaluate_binary_op(left, op, right, context):
     if op.type == POWER:
         return evaluate_pow(left, right, context)
 
@@ -95,6 +319,10 @@ def evaluate_op(op, context):
 
 
 def evaluate_pow(left, right, context):
+    return create_token(context, BasicToken, ClassInstance, pow_value(left, right, context))
+
+
+def pow_value(left, right, context):
     post_unary = None
 
     if left.primary_type == PARENTHESIS:
@@ -112,7 +340,7 @@ def evaluate_pow(left, right, context):
     if post_unary is not None:
         result = -result if post_unary == '-' else +result
 
-    return create_token(context, BasicToken, ClassInstance, result)
+    return result
 
 
 def process_token(token, context):
@@ -120,37 +348,77 @@ def process_token(token, context):
         value = context[token.value]
 
         if isinstance(value, BasicToken):
-            process_token_exclam(value)
-        else:
-            value = BasicToken(context, pytypes2lotus.get(type(value), CLASSINSTANCE), value)
-            value.exclam = token.exclam
-            process_token_exclam(value)
-            apply_token_unary(value, to_unary=token.unary)
+            return process_token_exclam(value)
 
-        return value
+        value = BasicToken(context, pytypes2lotus.get(type(value), CLASSINSTANCE), value, exclam=token.exclam)
+
+        return apply_token_unary(process_token_exclam(value), to_unary=token.unary)
     elif token.primary_type == PARENTHESIS:
-        result_token = evaluate(token.value, context, return_token=True)
-        apply_token_unary(result_token, token.unary)
-        token = result_token
+        token = apply_token_unary(evaluate(token.value, context, return_token=True), token.unary)
 
-    process_token_exclam(token)
+    return process_token_exclam(token)
 
-    return token
+
+def process_value(token, context):
+    """
+    returns the same value as process_token(token, context).value, but python value of
+    a variable is not boxed into a token
+    """
+
+    if token.type == VARIABLE:
+        value = context[token.value]
+
+        if isinstance(value, BasicToken):
+            return not value.value if value.exclam else value.value
+        if token.exclam:
+            value = not value
+
+        return -value if token.unary == '-' else value
+    if token.primary_type == PARENTHESIS:
+        expression = token.value
+
+        if type(expression) is not Expression or expression.leaves is None or not expression.operations:
+            return process_token(token, context).value
+
+        value = evaluate_operations(expression, context)
+
+        if type(value) in UNBOXED_TYPES:
+            return -value if token.unary == '-' else value
+
+        result = evaluate_single(create_token(context, BasicToken, ClassInstance, value), context)
+
+        return process_token_exclam(apply_token_unary(result, token.unary)).value
+
+    return not token.value if token.exclam else token.value
 
 
 def process_token_exclam(token, of_token=None):
+    """
+    returns token, which value is negated, if the token (or of_token) has an exclam.
+    Tokens are not changed, as they may be tokens of the tree or values of variables
+    """
+
     if of_token is None:
         of_token = token
 
-    if of_token.exclam:
-        token.value = not token.value
-        token.exclam = False
+    if not of_token.exclam:
+        return token
+
+    return with_value(token, not token.value, exclam=False)
 
 
 def apply_token_unary(token, to_unary=None):
     if to_unary is None:
         to_unary = token.unary
 
-    token.value = -token.value if to_unary == '-' else token.value
+    if to_unary != '-':
+        return token
 
-    return token
+    return with_value(token, -token.value, exclam=token.exclam)
+
+
+def with_value(token, value, exclam):
+    unary = token.unary if type(token) is BasicToken else '+'
+
+    return BasicToken(getattr(token, 'context', None), token.type, value, unary=unary, exclam=exclam,
+                      primary_type=token.primary_type)
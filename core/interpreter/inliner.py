@@ -0,0 +1,210 @@
+from core.utils.tools import tree_children
+from core.utils.contexts import GlobalName
+from core.utils.expressions import Expression
+from core.utils.tokens import BasicToken, Function, Class, FunctionCall, VarAssign, ReturnStatement
+from core.utils.tokentypes import VARIABLE, PARENTHESIS, MATHEXPR, OPERATOR, FCALL
+from core.interpreter.blocks import LITERALS, collect_names, root_name
+
+"""
+Inlining of small functions: call of a function, which body is a single return of an
+expression of its arguments, is replaced by that expression, where arguments are
+substituted by the expressions they are given by the call, so it is evaluated without
+a call frame.
+
+Function is inlined only if it can't be something else at the call site:
+- it is defined at the top level, and the call is in one of the statements after it
+- its name is assigned only once in the tree, and there is no exec, eval or import, that
+  may assign it
+- its body is parsed: bodies, that are parsed when they are used first, are not inlined, but
+  calls in them are inlined when they are parsed
+- call in a function or class body is inlined only in the main program, as functions see
+  globals of the main context, not of the module they are defined in
+
+Arguments are evaluated once by a call, so argument is inlined only if evaluating it is
+pure, its parameter is used by the body, and it is a single token if the parameter is used
+more than once
+"""
+
+MAX_INLINED_TOKENS = 32
+
+
+class Inliner:
+    def __init__(self, changes, in_functions, functions=None):
+        """
+        in_functions: whether calls in bodies of functions and classes are inlined
+        functions: functions, that are already known to be inlined
+        """
+
+        self.changes = changes
+        self.in_functions = in_functions
+        # name: function, parameters uses
+        self.functions = {} if functions is None else functions
+        # expressions, calls are replaced by
+        self.inlined = []
+        # id of body, that is not parsed yet: functions, that can be inlined into it
+        self.lazy_functions = {}
+
+    def inline_calls(self, node, visited):
+        if id(node) in visited:
+            return
+
+        visited.add(id(node))
+
+        if isinstance(node, (Function, Class)) and not self.in_functions:
+            return
+        if isinstance(node, (Function, Class)) and node.lazy_body is not None:
+            self.lazy_functions[id(node.lazy_body)] = dict(self.functions)
+
+        if isinstance(node, VarAssign):
+            node.value = self.inline_call(node.value)
+        elif isinstance(node, ReturnStatement) and isinstance(node.value, list):
+            node.value[:] = [self.inline_call(value) for value in node.value]
+        elif isinstance(node, FunctionCall):
+            node.args[:] = [self.inline_call(arg) for arg in node.args]
+        elif isinstance(node, Expression) and node.leaves is not None and (node.calls or node.jumps):
+            node[::2] = [self.inline_call(leaf) for leaf in node.leaves]
+            node.compile()
+
+        for child in tree_children(node):
+            self.inline_calls(child, visited)
+
+    def inline_call(self, call):
+        """
+        returns expression the call is replaced by, or the call itself
+        """
+
+        if not isinstance(call, FunctionCall) or type(call.name) not in (str, GlobalName) \
+                or call.name not in self.functions or call.unary != '+' or call.exclam or call.kwargs:
+            return call
+
+        function, uses = self.functions[call.name]
+
+        if len(call.args) != len(function.args):
+            return call
+
+        for arg, arg_uses in zip(call.args, uses):
+            if not arg_uses or not is_pure(arg) or (arg_uses > 1 and not is_single_token(arg)):
+                return call
+
+        body = function.code[0].value[0]
+        params = {str(param.value): parenthesize(arg) for param, arg in zip(function.args, call.args)}
+        tokens = body.value if body.type == MATHEXPR else [body]
+        expression = Expression([substitute(token, params) for token in tokens])
+        self.inlined.append(expression)
+        self.changes.append(f'line {call.lineno}: inlined call of {call.name}')
+
+        return BasicToken(body.context, MATHEXPR, expression, lineno=call.lineno)
+
+    def add_function(self, function):
+        if function.lazy_body is not None or function.kwargs or len(function.code) != 1 \
+                or not isinstance(function.code[0], ReturnStatement):
+            return
+
+        value = function.code[0].value
+
+        if not isinstance(value, list) or len(value) != 1 or type(value[0]) is not BasicToken:
+            return
+
+        params = [str(param.value) for param in function.args]
+        uses = dict.fromkeys(params, 0)
+
+        if count_tokens(value[0], uses) <= MAX_INLINED_TOKENS:
+            self.functions[str(function.name)] = function, [uses[param] for param in params]
+
+
+def inline_functions(tree, inliner, blocks):
+    """
+    inlines calls of the top level functions of the tree in place
+
+    blocks: optimizer of blocks of the tree, that knows what the tree may assign
+    """
+
+    if blocks.dynamic:
+        return
+
+    writes = {}
+    collect_names(tree, set(), writes, set())
+
+    for statement in tree:
+        inliner.inline_calls(statement, set())
+
+        if isinstance(statement, Function) and writes.get(root_name(statement.name)) == 1 \
+                and root_name(statement.name) not in blocks.global_writes:
+            inliner.add_function(statement)
+
+
+def count_tokens(token, uses):
+    """
+    returns number of tokens of the body, if it uses only its parameters, literals and
+    operators, else infinity. Uses of parameters are counted to uses
+    """
+
+    if type(token) is not BasicToken:
+        return float('inf')
+    if token.type == VARIABLE:
+        if token.value not in uses or token.unary != '+' or token.exclam:
+            return float('inf')
+
+        uses[token.value] += 1
+
+        return 1
+    if token.primary_type == PARENTHESIS or token.type == MATHEXPR:
+        if not isinstance(token.value, list):
+            return float('inf')
+
+        return 1 + sum(count_tokens(item, uses) for item in token.value)
+
+    return 1 if token.type & LITERALS or token.primary_type == OPERATOR else float('inf')
+
+
+def is_pure(token):
+    if type(token) is not BasicToken or token.primary_type == FCALL:
+        return False
+    if token.primary_type == PARENTHESIS or token.type == MATHEXPR:
+        return isinstance(token.value, list) and all(is_pure(item) for item in token.value)
+
+    return token.type == VARIABLE or token.type & LITERALS or token.primary_type == OPERATOR
+
+
+def is_single_token(token):
+    if token.type == MATHEXPR:
+        if len(token.value) != 1:
+            return False
+
+        token = token.value[0]
+
+    return token.type == VARIABLE or bool(token.type & LITERALS)
+
+
+def parenthesize(arg):
+    """
+    returns token, which value is evaluated the way the call evaluates the argument
+    """
+
+    tokens = arg.value if arg.type == MATHEXPR else [arg]
+
+    return BasicToken(arg.context, PARENTHESIS, Expression([copy_token(token) for token in tokens]),
+                      lineno=arg.lineno)
+
+
+def substitute(token, params):
+    if token.type == VARIABLE:
+        return copy_token(params[token.value])
+
+    copy = token.clone()
+    copy.lineno = token.lineno
+
+    if isinstance(token.value, list):
+        copy.value = Expression([substitute(item, params) for item in token.value])
+
+    return copy
+
+
+def copy_token(token):
+    copy = token.clone()
+    copy.lineno = token.lineno
+
+    if isinstance(token.value, list):
+        copy.value = Expression([copy_token(item) for item in token.value])
+
+    return copy
@@ -2,28 +2,40 @@ from sys import exit
 
 from lib.std.modules import cache
 from core.semantic import semantic
+from core.interpreter import ltcache, optimizer
 from core.lexer.lexer import Lexer
 from core.interpreter.eval import evaluate
 from core.utils.contexts import main_context, Context
-from core.utils.tools import process_escape_characters
 from core.utils.tokentypes import (MATHEXPR, RETURN_STATEMENT,
                                    CONTINUE_STATEMENT, BREAK_STATEMENT,
                                    IMPORT_STATEMENT)
 
-EXECUTOR_GIVE_HANDLING_BACK_IF_TYPES = (CONTINUE_STATEMENT, RETURN_STATEMENT, BREAK_STATEMENT)
+EXECUTOR_GIVE_HANDLING_BACK_IF_TYPES = CONTINUE_STATEMENT | RETURN_STATEMENT | BREAK_STATEMENT
 DEFAULT_EXCEPTION_FORM = """\
 {file}, on line {lineno}:
     {errname}: {errtext}"""
 
 
-def interpret(raw: str, context=None, exit_after_execution=True, file='<incognito>'):
+def interpret(raw, context=None, exit_after_execution=True, file='<incognito>'):
+    """
+    raw: source string or file object to lex the source from
+    """
+
     if context is None:
         main_context.clear()
         context = main_context
 
-    lexer = Lexer(process_escape_characters(raw))
-    lexemes = lexer.parse()
-    final_tokens = semantic.parse(context, execute, evaluate, lexemes)
+    if hasattr(raw, 'readline'):
+        final_tokens = ltcache.load(raw, context)
+
+        if final_tokens is None:
+            final_tokens = semantic.parse(context, execute, evaluate, Lexer().parse_stream(raw))
+            optimizer.optimize(final_tokens, context)
+            # tree is cached before the execution, as executor may change it
+            ltcache.dump(raw, final_tokens, context)
+    else:
+        lexer = Lexer(raw)
+        final_tokens = optimizer.optimize(semantic.parse(context, execute, evaluate, lexer.parse()), context)
     token = None
 
     exec_iterator = executor(final_tokens, context=context)
@@ -65,15 +77,15 @@ def executor(tokens, context=None):
             context[token.name] = module_context
         elif token.type == MATHEXPR:
             evaluate(token.value, context=context)
-        elif token.type in EXECUTOR_GIVE_HANDLING_BACK_IF_TYPES:
+        elif token.type & EXECUTOR_GIVE_HANDLING_BACK_IF_TYPES:
             if token.type == RETURN_STATEMENT:
-                token.execute_value(context)
+                return token.execute_value(context)
 
             return token
         else:
             result = token.execute(context)
 
-            if hasattr(result, 'type') and result.type in EXECUTOR_GIVE_HANDLING_BACK_IF_TYPES:
+            if hasattr(result, 'primary_type') and result.type & EXECUTOR_GIVE_HANDLING_BACK_IF_TYPES:
                 return result
 
 
@@ -94,12 +106,10 @@ def import_file(path):
         return cache[path]
 
     with open(path) as fd:
-        source = fd.read()
-
-    new_context = Context()
-    cache[path] = new_context
+        new_context = Context()
+        cache[path] = new_context
 
-    return interpret(source, context=new_context, exit_after_execution=False, file=path), new_context
+        return interpret(fd, context=new_context, exit_after_execution=False, file=path), new_context
 
 
 def format_exception(file, lineno, errname, errtext):
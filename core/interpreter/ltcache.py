@@ -0,0 +1,122 @@
+import os
+import sys
+import pickle
+from tempfile import mkstemp
+
+from lib.std.bindings import pybindings
+from core.interpreter import optimizer
+from core.semantic import parsers
+from core.utils.contexts import main_context
+
+"""
+On-disk cache of parsed programs, the same thing __pycache__ is for python.
+Tree of the source file `dir/name.lt` is stored to `dir/__ltcache__/name.ltc`,
+and it is valid only for the same path, modification time and size of the source,
+and for the same interpreter version, optimizations switch and eager parsing switch.
+Tree of the main program is optimized differently from the tree of an imported module
+(calls in functions are inlined only in the main program), so it is a part of the key too.
+
+Tree is pickled, except the context it was parsed with: it is saved as a reference,
+and replaced by the context of current run while loading. If tree contains something
+that can't be pickled (for example, python module), it just is not cached
+"""
+
+CACHE_DIRECTORY = '__ltcache__'
+CACHE_EXTENSION = '.ltc'
+# increase it every time tokens or constructions are changed
+FORMAT_VERSION = 14
+VERSION = (FORMAT_VERSION, pybindings['__version__'], sys.implementation.cache_tag)
+# the same as PYTHONDONTWRITEBYTECODE does
+enabled = not os.environ.get('LOTUSDONTWRITECACHE')
+
+
+class TreePickler(pickle.Pickler):
+    def __init__(self, fd, context):
+        super().__init__(fd, pickle.HIGHEST_PROTOCOL)
+        self.context = context
+
+    def persistent_id(self, obj):
+        return 'context' if obj is self.context else None
+
+
+class TreeUnpickler(pickle.Unpickler):
+    def __init__(self, fd, context):
+        super().__init__(fd)
+        self.context = context
+
+    def persistent_load(self, pid):
+        if pid != 'context':
+            raise pickle.UnpicklingError('unknown persistent id: ' + str(pid))
+
+        return self.context
+
+
+def get_cache_path(path):
+    directory, filename = os.path.split(os.path.abspath(path))
+
+    return os.path.join(directory, CACHE_DIRECTORY, os.path.splitext(filename)[0] + CACHE_EXTENSION)
+
+
+def get_header(source_fd, context):
+    """
+    returns key of the cached tree, or None if source is not a file on disk
+
+    context: context the tree is parsed with, main_context for the main program
+    """
+
+    path = getattr(source_fd, 'name', None)
+
+    if not enabled or not isinstance(path, str):
+        return None
+
+    stat = os.fstat(source_fd.fileno())
+
+    return (VERSION, optimizer.enabled, parsers.eager_bodies, context is main_context,
+            os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def load(source_fd, context):
+    """
+    returns cached tree of the opened source file, or None if there is no valid cache
+    """
+
+    header = get_header(source_fd, context)
+
+    if header is None:
+        return None
+
+    try:
+        with open(get_cache_path(source_fd.name), 'rb') as cache_fd:
+            unpickler = TreeUnpickler(cache_fd, context)
+
+            if unpickler.load() != header:
+                return None
+
+            return unpickler.load()
+    except Exception:   # missing or broken cache file is the same as no cache
+        return None
+
+
+def dump(source_fd, tree, context):
+    header = get_header(source_fd, context)
+
+    if header is None:
+        return
+
+    cache_path = get_cache_path(source_fd.name)
+    temp_path = None
+
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_fd, temp_path = mkstemp(dir=os.path.dirname(cache_path), suffix='.tmp')
+
+        with open(temp_fd, 'wb') as cache_fd:
+            pickler = TreePickler(cache_fd, context)
+            pickler.dump(header)
+            pickler.dump(tree)
+
+        # cache file is replaced atomically, so nobody reads a half-written one
+        os.replace(temp_path, cache_path)
+    except (OSError, pickle.PicklingError, TypeError, AttributeError, RecursionError):
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
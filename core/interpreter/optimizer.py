@@ -0,0 +1,283 @@
+import os
+import sys
+from functools import partial
+
+from core.utils.tools import tree_children
+from core.utils.contexts import main_context
+from core.utils.tokens import BasicToken, Function, Class
+from core.utils.expressions import Expression
+from core.utils.tokentypes import (INTEGER, FLOAT, STRING, BOOL,
+                                   VARIABLE, PARENTHESIS, POWER, OPERATOR)
+from core.interpreter.eval import (evaluate, evaluate_binary_op, evaluate_single,
+                                   process_token)
+from core.interpreter.resolver import resolve_function
+from core.interpreter.blocks import BlocksOptimizer, walk_nodes
+from core.interpreter.inliner import Inliner, inline_functions
+from core.interpreter.cse import CommonSubexpressions
+
+"""
+Optimizations of the semantic tree, that are made once, after it is parsed:
+- constant folding: operations of literals, and parenthesized constants with their
+  unaries and exclams, are replaced by their results
+- strength reduction: `x ** 2` is evaluated as `x * x` for integers
+- scope resolution: names of functions bodies are resolved to slots of locals
+  and lookups of globals (core/interpreter/resolver.py)
+- inlining: calls of small functions are replaced by their bodies (core/interpreter/inliner.py)
+- dead code elimination and loop-invariant code motion (core/interpreter/blocks.py)
+- common subexpression elimination: repeated pure subexpressions are evaluated once
+  (core/interpreter/cse.py)
+
+Bodies of functions and classes, that are parsed when they are used first time
+(core/semantic/parsers.py), are optimized the same way right after they are parsed.
+
+Constants are evaluated by the same functions the evaluator uses, so results are the same
+as they would be at runtime. Operation, that raises an error, is left as it is, and raises
+it at runtime. Optimizations can be turned off by the LOTUSNOOPTIMIZE environment variable,
+and changes of inlining and blocks are printed to stderr if LOTUSOPTIMIZEREPORT is set
+"""
+
+LITERALS = INTEGER | FLOAT | STRING | BOOL
+# operations, which results may take too much time or memory, are not folded
+MAX_FOLDED_EXPONENT = 128
+MAX_FOLDED_STRING_LENGTH = 4096
+enabled = not os.environ.get('LOTUSNOOPTIMIZE')
+report = bool(os.environ.get('LOTUSOPTIMIZEREPORT'))
+
+
+def optimize(tree, context, changes=None):
+    """
+    optimizes tree in place, and returns it. Descriptions of changes of blocks
+    are appended to changes, if it is given
+    """
+
+    if not enabled:
+        return tree
+
+    if changes is None:
+        changes = []
+
+    walk(tree, context, set())
+    blocks = BlocksOptimizer(tree, changes)
+    inliner = Inliner(changes, in_functions=context is main_context)
+    inline_functions(tree, inliner, blocks)
+    fold_inlined(inliner, context)
+    blocks.optimize(tree)
+    CommonSubexpressions(changes, blocks.pyimported).eliminate(tree)
+    defer_optimization(tree, context, blocks, inliner)
+    report_changes(changes)
+
+    return tree
+
+
+def optimize_body(context, blocks, functions, owner):
+    """
+    optimizes body of function or class, that is parsed when it is used first time
+
+    blocks: optimizer of blocks of the tree, the owner is defined in
+    functions: functions, that can be inlined into the body
+    """
+
+    changes = []
+    body = owner.parsed_body
+    walk(body, context, set())
+
+    if isinstance(owner, Function):
+        resolve_function(owner)
+
+    inliner = Inliner(changes, in_functions=True, functions=functions)
+    inliner.inline_calls(body, set())
+    fold_inlined(inliner, context)
+    body_blocks = BlocksOptimizer(body, changes, outer=blocks)
+    body_blocks.optimize_statement(owner, in_try=False)
+    CommonSubexpressions(changes, body_blocks.pyimported).eliminate(body, owner)
+    defer_optimization(body, context, body_blocks, inliner)
+    report_changes(changes)
+
+
+def fold_inlined(inliner, context):
+    for expression in inliner.inlined:
+        # arguments may make the body constant
+        walk(expression, context, set())
+
+
+def defer_optimization(tree, context, blocks, inliner):
+    """
+    bodies of the tree, that are not parsed yet, are optimized when they are parsed
+    """
+
+    for node in walk_nodes(tree):
+        if isinstance(node, (Function, Class)) and node.lazy_body is not None:
+            functions = inliner.lazy_functions.get(id(node.lazy_body), {})
+            node.lazy_body.optimize = partial(optimize_body, context, blocks, functions)
+
+
+def report_changes(changes):
+    if report:
+        for change in changes:
+            print('optimizer:', change, file=sys.stderr)
+
+
+def walk(node, context, visited):
+    if id(node) in visited:
+        return
+
+    visited.add(id(node))
+
+    for child in tree_children(node):
+        walk(child, context, visited)
+
+    # nested expressions are already folded
+    if isinstance(node, Expression):
+        fold_expression(node, context)
+
+    if isinstance(node, Function) and node.local_names is None and node.lazy_body is None:
+        resolve_function(node)
+
+
+def fold_expression(expression, context):
+    leaves = expression.leaves
+
+    if leaves is None:
+        return
+
+    # first and last leaves, that every value takes
+    spans = [(index, index) for index in range(len(leaves))]
+    constants = [leaf if is_constant(leaf) else None for leaf in leaves]
+    # index of the first replaced leaf: index of the last replaced leaf, and the token they are replaced by
+    replacements = {}
+    # index of the leaf before operator: operator it is replaced by
+    operators = {}
+
+    if not expression.operations and constants[0] is not None and leaves[0].primary_type == PARENTHESIS:
+        replacements[0] = 0, fold(evaluate_single, leaves[0], context)
+
+    for left, op, right in expression.operations:
+        start, end = spans[left][0], spans[right][1]
+        result = None
+
+        if constants[left] is not None and constants[right] is not None and not too_expensive(
+                constants[left], op, constants[right]):
+            result = fold(evaluate_binary_op, constants[left], op, constants[right], context)
+
+        if result is not None:
+            replacements.pop(spans[right][0], None)
+            replacements[start] = end, result
+        else:
+            for operand, pow_left in ((left, op.type == POWER), (right, False)):
+                if operand < len(leaves) and constants[operand] is not None \
+                        and leaves[operand].primary_type == PARENTHESIS:
+                    replacements[operand] = operand, fold_operand(leaves[operand], pow_left, context)
+
+            if is_square(op, leaves, left, right):
+                operators[spans[left][1]] = square_operator(op)
+
+        spans.append((start, end))
+        constants.append(result)
+
+    if not replacements and not operators:
+        return
+
+    tokens = []
+    index = 0
+
+    while index < len(leaves):
+        end, token = replacements.get(index, (index, None))
+        tokens.append(leaves[index] if token is None else token)
+
+        if end + 1 < len(leaves):
+            tokens.append(operators.get(end, expression[end * 2 + 1]))
+
+        index = end + 1
+
+    expression[:] = tokens
+    expression.compile()
+
+
+def fold_operand(token, pow_left, context):
+    """
+    returns parenthesized constant, evaluated the way the evaluator does it for an operand
+    """
+
+    if pow_left:
+        # left operand of power is evaluated without its unary and exclam
+        return fold(evaluate, token.value, context, return_token=True)
+
+    return fold(process_token, token, context)
+
+
+def fold(function, *args, **kwargs):
+    """
+    returns token, that evaluation results, or None, if it can't be used as a constant
+    """
+
+    try:
+        result = function(*args, **kwargs)
+    except Exception:
+        return None
+
+    if type(result) is not BasicToken or not result.type & LITERALS or result.exclam:
+        return None
+    if isinstance(result.value, str) and len(result.value) > MAX_FOLDED_STRING_LENGTH:
+        return None
+
+    # unary is already applied to the value. Result may be a token of the tree, so it is copied
+    if result.unary != '+':
+        result = result.clone()
+        result.unary = '+'
+
+    return result
+
+
+def too_expensive(left, op, right):
+    if op.type != POWER and op.value not in ('<<', '*'):
+        return False
+
+    right = constant_value(right)
+
+    if op.value == '*':
+        # repetition of a sequence is checked before it is made, not after
+        left = constant_value(left)
+
+        return left is None or right is None or is_long_repetition(left.value, right.value) \
+            or is_long_repetition(right.value, left.value)
+
+    return right is None or not isinstance(right.value, (int, float)) or abs(right.value) > MAX_FOLDED_EXPONENT
+
+
+def constant_value(token):
+    if token.primary_type == PARENTHESIS:
+        return fold(evaluate_single, token, None)
+
+    return token
+
+
+def is_long_repetition(sequence, count):
+    return isinstance(sequence, (str, list, tuple)) and isinstance(count, int) \
+        and len(sequence) * count > MAX_FOLDED_STRING_LENGTH
+
+
+def is_constant(token):
+    if type(token) is not BasicToken:
+        return False
+    if token.type & LITERALS:
+        return True
+
+    return token.primary_type == PARENTHESIS and isinstance(token.value, Expression) \
+        and len(token.value) == 1 and is_constant(token.value[0])
+
+
+def is_square(op, leaves, left, right):
+    if op.type != POWER or left >= len(leaves) or right >= len(leaves):
+        return False
+
+    base, exponent = leaves[left], leaves[right]
+
+    return base.type == VARIABLE and base.unary == '+' and not base.exclam \
+        and exponent.type == INTEGER and exponent.value == 2 and not exponent.exclam
+
+
+def square_operator(op):
+    square = BasicToken(op.context, OPERATOR, '**2', lineno=op.lineno)
+    square.priority = op.priority
+
+    return square
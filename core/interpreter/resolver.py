@@ -0,0 +1,105 @@
+from core.utils.tools import tree_children
+from core.utils.contexts import LocalName, GlobalName, AttributeName
+from core.utils.tokens import (BasicToken, Function, Class, FunctionCall, VarAssign,
+                               ImportStatement, PyimportStatement)
+from core.utils.tokentypes import VARIABLE, TUPLE
+
+"""
+Scope resolution of functions bodies. Every name, that function body uses, is one of:
+- local: argument of the function, or a name it assigns. It gets index of its slot
+  in the frame of a call, so reading and writing it is indexing a list
+- global: any other name. It is looked up in builtins and the main context, without
+  looking through the locals and splitting it by dots
+- attribute path: dotted name, its first name is resolved as above, and the path is split once
+
+Resolved names are still strings, so everything that uses names as strings works with them.
+Nested functions don't see locals of the function they are defined in, so their bodies are
+resolved on their own, and bodies of classes are not resolved, as they are executed in
+contexts of instances. Names, that are not known before execution (assigned by exec), are
+stored in the frame as in usual context
+"""
+
+
+def resolve_function(function):
+    local_names = {}
+
+    for arg in (*function.args, *function.kwargs):
+        add_local(local_names, arg.value)
+
+    collect_locals(function.code, local_names, set())
+
+    for arg in (*function.args, *function.kwargs):
+        arg.value = resolve_name(arg.value, local_names)
+
+    rename(function.code, local_names, set())
+    function.local_names = local_names
+
+
+def collect_locals(node, local_names, visited):
+    if id(node) in visited:
+        return
+
+    visited.add(id(node))
+
+    if isinstance(node, VarAssign):
+        name = node.name
+        names = name.value if hasattr(name, 'primary_type') and name.type == TUPLE else [name]
+
+        for var in names:
+            if hasattr(var, 'primary_type') and var.type == VARIABLE:
+                add_local(local_names, var.value)
+    elif isinstance(node, (Function, Class, ImportStatement, PyimportStatement)):
+        add_local(local_names, node.name)
+
+        if isinstance(node, (Function, Class)):
+            return  # body has its own names
+
+    for child in tree_children(node):
+        collect_locals(child, local_names, visited)
+
+
+def add_local(local_names, name):
+    if isinstance(name, str) and '.' not in name and name not in local_names:
+        local_names[name] = len(local_names)
+
+
+def rename(node, local_names, visited):
+    if id(node) in visited:
+        return
+
+    visited.add(id(node))
+
+    if isinstance(node, BasicToken):
+        if node.type == VARIABLE:
+            node.value = resolve_name(node.value, local_names)
+    elif isinstance(node, FunctionCall):
+        node.name = resolve_name(node.name, local_names)
+
+        # keys of kwargs are names of arguments of the called function
+        for child in (*node.args, *node.kwargs.values()):
+            rename(child, local_names, visited)
+
+        return
+    elif isinstance(node, (Function, Class, ImportStatement, PyimportStatement)):
+        node.name = resolve_name(node.name, local_names)
+
+        if isinstance(node, (Function, Class)):
+            return
+
+    for child in tree_children(node):
+        rename(child, local_names, visited)
+
+
+def resolve_name(name, local_names):
+    if type(name) is not str:
+        return name  # already resolved, or not a name at all
+
+    first_name, dot, _ = name.partition('.')
+
+    if dot:
+        # global.name is looked up by the context itself
+        return name if first_name == 'global' else AttributeName(name, resolve_name(first_name, local_names))
+    if name in local_names:
+        return LocalName(name, local_names[name])
+
+    return GlobalName(name)
@@ -1,4 +1,4 @@
-from core.utils.tools import split_tokens, contains
+from core.utils.tools import split_tokens, split_by_indexes, contains
 from core.utils.tokentypes import (COMMA, COLON, LIST,
                                    DICT, QBRACES, FBRACES,
                                    PARENTHESIS, NEWLINE, TUPLE,
@@ -13,9 +13,9 @@ Actually, I'm trying to implement data types for the 5th time. I hope, it'll wor
 """
 
 
-def parse_list(token):
+def parse_list(token, items=None):
     token.type = token.primary_type = LIST
-    split_by_comma = split_tokens(token.value, COMMA)
+    split_by_comma = split_tokens(token.value, COMMA) if items is None else items
 
     if not (len(split_by_comma) == 1 and split_by_comma[0] == []):
         token.value = split_by_comma
@@ -23,16 +23,18 @@ def parse_list(token):
     return token
 
 
-def parse_tuple(token):
-    token = parse_list(token)
+def parse_tuple(token, items=None):
+    token = parse_list(token, items)
     token.type = token.primary_type = TUPLE
 
     return token
 
 
-def parse_dict(token):
+def parse_dict(token, key_value_pairs=None):
     token.type = token.primary_type = DICT
-    key_value_pairs = split_tokens(token.value, COMMA, exclude=(NEWLINE,))
+
+    if key_value_pairs is None:
+        key_value_pairs = split_tokens(token.value, COMMA, exclude=NEWLINE)
     raw_result = {}
 
     if not key_value_pairs[-1]:
@@ -68,3 +70,19 @@ def process_token(token):
             return parser(token)
 
     return token
+
+
+def process_braces(token, commas, has_colon):
+    """
+    process_token analog for the single-pass lexer: values of the token are already
+    processed, and commas indexes are collected while lexing, so nothing is scanned twice
+    """
+
+    if token.type == QBRACES:
+        return parse_list(token, split_by_indexes(token.value, commas))
+    elif token.type == FBRACES and has_colon:
+        return parse_dict(token, split_by_indexes(token.value, commas, exclude=NEWLINE))
+    elif token.type == BRACES and commas:
+        return parse_tuple(token, split_by_indexes(token.value, commas))
+
+    return token
@@ -1,3 +1,8 @@
+import re
+from os import cpu_count
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
 from core.lexer import datatypes
 from core.utils import (keywords, tokentypes,
                         operators, tokens,
@@ -14,24 +19,104 @@ braces_types = {
     '}': tokentypes.FBRACES,
 }
 
+# legacy lexer grows operators letter by letter, so an operator can be lexed only if
+# all of its prefixes are operators too (that's why `...` never appears in the output)
+lexable_operators = [operator for operator in operators.characters if operator != '\n' and
+                     all(operator[:length] in operators.characters for length in range(1, len(operator)))]
+operators_pattern = re.compile('|'.join(map(re.escape, sorted(lexable_operators, key=len, reverse=True))))
+# dot is not a word breaker: `a.b.c` and `1.5` are single words
+word_pattern = re.compile('[^' + re.escape(''.join(operators.special_characters - {'.'}) + ' \'"') + ']+')
+spaces_pattern = re.compile(' +')
+# trailing whitespaces of a line (including tabs, which are word characters) are ignored
+line_ending_pattern = re.compile(r'[^\S\n]*(?:#|\n|\Z)')
+# strings and comments openers
+quotes_pattern = re.compile('[\'"#]')
+# sources are split to pieces for parallel lexing on lines, that begin from the first column
+piece_bound_pattern = re.compile(r'\n(?=[^\s)\]}])')
+
+
+@lru_cache(maxsize=4096)
+def word_type(word):
+    """
+    returns (type, value) of a word - the same types provide_token_type gives
+    """
+
+    if word.isdigit():
+        return tokentypes.INTEGER, int(word)
+    elif tools.isfloat(word):
+        return tokentypes.FLOAT, float(word)
+    elif word in keywords.keywords:
+        return keywords.keywords[word], word
+
+    return tokentypes.VARIABLE, word
+
+
+class BracesLevel:
+    """
+    tokens inside of a single pair of braces (or the top level, if opener is None)
+    """
+
+    def __init__(self, opener):
+        self.opener = opener
+        self.tokens = []
+        self.signs = []     # operators, that are going to be unary signs of the next token
+        self.previous_token = None
+        self.commas = []    # indexes of commas in tokens
+        self.has_colon = False
+
+    def append(self, token):
+        if token.type == tokentypes.COMMA:
+            self.commas.append(len(self.tokens))
+        elif token.type == tokentypes.COLON:
+            self.has_colon = True
+
+        self.tokens.append(token)
+
+    def close(self):
+        # signs that are not followed by any token are left as they are
+        for sign in self.signs:
+            self.append(sign)
+
+        self.signs = []
+
+        return self.tokens
+
+    def drain(self):
+        """
+        returns tokens collected so far and forgets them (used for the top level only)
+        """
+
+        drained, self.tokens = self.tokens, []
+        self.commas = []
+
+        return drained
+
 
 class Lexer:
-    def __init__(self, raw=None, context=None):
+    def __init__(self, raw=None, context=None, legacy=False,
+                 parallel_threshold=None, workers=None):
+        """
+        legacy: use the old per-character lexer instead of the regex-based one.
+                Both of them produce the same tokens, so it is used to compare their outputs
+        parallel_threshold: sources of this length (in characters) and longer are lexed by
+                            a process pool (None disables it, what is the default)
+        workers: processes in the pool, cpu count by default
+        """
+
         if context is None:
             context = {}
+        if workers is None:
+            workers = cpu_count() or 1
 
         self.raw = raw
         self.context = context
+        self.legacy = legacy
+        self.parallel_threshold = parallel_threshold
+        self.workers = workers
 
     @staticmethod
     def prepare_raw_source(source):
-        prepared_raw = ''
-
-        for line in source.splitlines():
-            prepared_line = tools.remove_comment(line).rstrip()
-            prepared_raw += prepared_line + '\n'
-
-        return prepared_raw[:-1]
+        return '\n'.join(tools.remove_comment(line).rstrip() for line in source.splitlines())
 
     def parse(self, code=None, context=None):
         if code is None:
@@ -42,8 +127,283 @@ class Lexer:
         if context is None:
             context = self.context
 
+        if not self.legacy:
+            if self.parallel_threshold is not None and len(code) >= self.parallel_threshold and self.workers > 1:
+                return self.tokenize_parallel(code, context)
+
+            return self.tokenize(code, context)
+
         code = self.prepare_raw_source(code)
-        output_tokens = [tokens.BasicToken(context, tokentypes.NO_TYPE, '')]
+        output_tokens = self.tokenize_legacy(code, context)
+        parsed_but_no_unary = self.parse_braces(context, output_tokens)
+        final = self.parse_unary(parsed_but_no_unary)
+
+        return list(map(datatypes.process_token, final))
+
+    def parse_stream(self, source, context=None):
+        """
+        lexes source from a file object (or memory-mapped file), yielding tokens as
+        soon as they are completed. Source is read line by line, so only the current
+        top-level braces group is kept in memory instead of the whole file.
+        Always uses regex-based tokenizer
+        """
+
+        if context is None:
+            context = self.context
+
+        return self.tokenize_lines(self.read_lines(source), context)
+
+    @staticmethod
+    def read_lines(source):
+        line = source.readline()
+
+        while line:
+            if isinstance(line, bytes):  # memory-mapped file
+                line = line.decode()
+
+            yield line[:-1] if line.endswith('\n') else line
+
+            line = source.readline()
+
+    def tokenize_lines(self, lines, context):
+        """
+        tokenizes lines one by one. Lines of a multi-line string are collected
+        to a single block, as string can't be tokenized by parts
+        """
+
+        levels = [BracesLevel(None)]
+        block = []
+        lineno = 1
+        unclosed_string = None
+
+        for line in lines:
+            block.append(line)
+            unclosed_string = self.get_unclosed_string(line, unclosed_string)
+
+            if unclosed_string is None:
+                self.tokenize_block(block, context, lineno, levels)
+                lineno += len(block)
+                block.clear()
+
+                if len(levels) == 1:
+                    yield from levels[0].drain()
+
+        if block:
+            self.tokenize_block(block, context, lineno, levels)
+
+        yield from self.finish_levels(levels)
+
+    def tokenize_block(self, block, context, lineno, levels):
+        code = '\n'.join(block)
+
+        if lineno > 1:
+            # newline that separates this block from the previous one
+            code, lineno = '\n' + code, lineno - 1
+
+        self.feed(code, context, lineno, levels)
+
+    def get_unclosed_string(self, line, opener=None):
+        """
+        returns quote of the string, left unclosed at the end of the line, or None
+
+        opener: quote of the string, that was left unclosed by previous lines
+        """
+
+        if opener is not None:
+            line = opener + line
+            string_begin = 0
+        else:
+            string_begin = self.find_string_begin(line, 0)
+
+        while string_begin != -1:
+            string_ending = self.find_string_ending(line, string_begin)
+
+            if string_ending == -1:
+                return line[string_begin]
+
+            string_begin = self.find_string_begin(line, string_ending + 1)
+
+        return None
+
+    @staticmethod
+    def find_string_begin(code, start):
+        """
+        returns index of the next quote, or -1 if there are no quotes till the comment
+        """
+
+        quote = quotes_pattern.search(code, start)
+
+        if quote is None or quote.group() == '#':
+            return -1
+
+        return quote.start()
+
+    def tokenize(self, code, context):
+        """
+        lexes code, building braces tokens and folding unary signs in the same pass.
+        Comments and escape characters of strings are also processed here, so source
+        is scanned only once. Output is the same as parse_braces, parse_unary and
+        datatypes.process_token give after the legacy lexer
+        """
+
+        levels = [BracesLevel(None)]
+        # the last newline is ignored, as splitlines() does
+        length = len(code) - 1 if code.endswith('\n') else len(code)
+        self.feed(code, context, 1, levels, length)
+
+        return self.finish_levels(levels)
+
+    def tokenize_parallel(self, code, context):
+        """
+        lexes pieces of code in a process pool and joins their tokens. Pieces begin on
+        lines without indentation, but if some of them ends inside of braces or string
+        anyway, code is lexed sequentially.
+
+        Tokens are sent from workers as tuples, but they still have to be re-created here,
+        what takes about 3/4 of time the lexing itself takes, so this is worth only with
+        a lot of cores
+        """
+
+        length = len(code) - 1 if code.endswith('\n') else len(code)
+        bounds = [0]
+
+        for piece_index in range(1, self.workers):
+            bound = piece_bound_pattern.search(code, max(length * piece_index // self.workers, bounds[-1] + 1), length)
+
+            if bound is not None:
+                bounds.append(bound.start())
+
+        bounds.append(length)
+        pieces = [code[start:end] for start, end in zip(bounds, bounds[1:])]
+        # newline, that begins a piece, belongs to the previous line
+        linenos = [1 + code.count('\n', 0, start) for start in bounds[:-1]]
+
+        with ProcessPoolExecutor(self.workers) as pool:
+            results = list(pool.map(tokenize_piece, pieces, linenos))
+
+        if not all(ends_at_top_level for _, ends_at_top_level in results):
+            return self.tokenize(code, context)
+
+        return [unpack_token(token, context) for piece_tokens, _ in results for token in piece_tokens]
+
+    def feed(self, code, context, lineno, levels, length=None):
+        """
+        levels: stack of opened braces. The first one is the top level (the output)
+        length: lex code only till this index
+        """
+
+        level = levels[-1]
+        index = 0
+
+        if length is None:
+            length = len(code)
+        # dot is an operator only if it goes right after another operator
+        after_operator = False
+        # word, written right after a string, is glued to it (legacy lexer does the same)
+        glue_to_string = None
+
+        while index < length:
+            letter = code[index]
+
+            if letter == '\n':
+                self.add_token(level, tokens.BasicToken(context, tokentypes.NEWLINE, '\n', lineno=lineno))
+                lineno += 1
+                index += 1
+                after_operator, glue_to_string = False, None
+            elif letter == ' ':
+                index = spaces_pattern.match(code, index).end()
+                after_operator, glue_to_string = False, None
+            elif letter in '\'"':
+                string_ending = self.find_string_ending(code, index)
+
+                if string_ending == -1:
+                    # unclosed string takes the whole rest of source
+                    raw_string, index = code[index:length - 1], length
+                else:
+                    raw_string, index = code[index:string_ending], string_ending + 1
+
+                string = raw_string[1:]
+
+                if '\\' in string:
+                    string = tools.process_escape_characters(string).replace("\\'", "'").replace('\\"', '"')
+
+                glue_to_string = tokens.BasicToken(context, tokentypes.STRING, string, lineno=lineno)
+                self.add_token(level, glue_to_string)
+                lineno += raw_string.count('\n')
+                after_operator = False
+            elif letter == '#':
+                # comment lasts till the end of line
+                index = code.find('\n', index, length)
+                index = length if index == -1 else index
+            elif letter in operators.special_characters and (letter != '.' or after_operator):
+                operator = operators_pattern.match(code, index).group()
+                index += len(operator)
+                after_operator, glue_to_string = True, None
+
+                if operator in braces_openers:
+                    level = BracesLevel(operator)
+                    levels.append(level)
+                elif operator in braces_types:
+                    if level.opener is None or braces_openers[level.opener] != operator:
+                        raise SyntaxError(f'line {lineno}: unexpected closing brace: {operator}')
+
+                    levels.pop()
+                    braces_token = self.close_level(context, level, operator, lineno)
+                    level = levels[-1]
+                    self.add_token(level, braces_token)
+                else:
+                    token = tokens.BasicToken(context, tokentypes.operators_types[operator], operator,
+                                              primary_type=tokentypes.OPERATOR, lineno=lineno)
+                    token.priority = priorities.for_tokens.get(operator, 0)
+                    self.add_token(level, token)
+            else:
+                word = word_pattern.match(code, index, length).group()
+                index += len(word)
+
+                if word[-1].isspace() and line_ending_pattern.match(code, index, length):
+                    word = word.rstrip()
+
+                if not word:
+                    continue
+                elif glue_to_string is not None:
+                    glue_to_string.value += word
+                else:
+                    word_type_, value = word_type(word)
+                    self.add_token(level, tokens.BasicToken(context, word_type_, value, lineno=lineno))
+
+                after_operator = False
+
+    def add_token(self, level, token):
+        previous_token = level.previous_token
+
+        if token.primary_type == tokentypes.OPERATOR and (
+                previous_token is None or previous_token.primary_type == tokentypes.OPERATOR):
+            level.signs.append(token)
+            return
+
+        if level.signs:
+            token = self.get_unary_token(token, level.signs)
+            level.signs = []
+
+        level.append(token)
+        level.previous_token = token
+
+    @staticmethod
+    def close_level(context, level, closer, lineno):
+        braces_token = tokens.BasicToken(context, braces_types[closer], level.close(),
+                                         primary_type=tokentypes.PARENTHESIS, lineno=lineno)
+
+        return datatypes.process_braces(braces_token, level.commas, level.has_colon)
+
+    @staticmethod
+    def finish_levels(levels):
+        if len(levels) > 1:
+            raise SyntaxError('unclosed braces')
+
+        return levels[0].close()
+
+    def tokenize_legacy(self, code, context):
+        output_tokens = [tokens.BasicToken(context, tokentypes.NO_TYPE, '', lineno=1)]
         skip_iters = 0
         lineno = 1
 
@@ -56,10 +416,11 @@ class Lexer:
                 continue
 
             if letter == '\n':
-                self.append(output_tokens, tokens.BasicToken(context, tokentypes.NEWLINE, '\n'))
+                self.append(output_tokens, tokens.BasicToken(context, tokentypes.NEWLINE, '\n', lineno=lineno - 1))
                 output_tokens.append(tokens.BasicToken(context, tokentypes.NO_TYPE, '', lineno=lineno))
             elif letter == ' ':
-                if output_tokens[-1].value in keywords.keywords:  # other way, just skip it
+                if output_tokens[-1].type == tokentypes.NO_TYPE and \
+                        output_tokens[-1].value in keywords.keywords:  # other way, just skip it
                     keyword = output_tokens[-1].value
                     keyword_type = keywords.keywords[keyword]
 
@@ -81,8 +442,15 @@ class Lexer:
                                                                  lineno=lineno))
             else:
                 if letter in tuple('\'"'):
-                    string, skip_iters = self.get_string_ending(code[index:])
-                    string = string[1:-1].replace("\\'", "'").replace('\\"', '"')
+                    string_ending = self.find_string_ending(code, index)
+
+                    if string_ending == -1:
+                        string, skip_iters = code[index:], -1
+                    else:
+                        string, skip_iters = code[index:string_ending + 1], string_ending - index
+
+                    string = tools.process_escape_characters(string[1:-1])
+                    string = string.replace("\\'", "'").replace('\\"', '"')
                     string_token = tokens.BasicToken(context, tokentypes.STRING, string, lineno=lineno)
                     self.append(output_tokens, string_token)
                     continue
@@ -92,14 +460,13 @@ class Lexer:
 
                 output_tokens[-1].value += letter
 
-        if output_tokens[-1].value == '':
+        if output_tokens[-1].type == tokentypes.NO_TYPE and output_tokens[-1].value == '':
             output_tokens.pop()
 
-        self.provide_token_type(output_tokens[-1])
-        parsed_but_no_unary = self.parse_braces(context, output_tokens)
-        final = self.parse_unary(parsed_but_no_unary)
+        if output_tokens:
+            self.provide_token_type(output_tokens[-1])
 
-        return list(map(datatypes.process_token, final))
+        return output_tokens
 
     def append(self, lst: list, item: any):
         if lst[-1].type == tokentypes.NO_TYPE and lst[-1].value == '':
@@ -152,7 +519,7 @@ class Lexer:
         token.unary = final_sign
         token.exclam = final_token_exclam
 
-        if token.type in (tokentypes.INTEGER, tokentypes.FLOAT):
+        if token.type & tokentypes.NUMBERS:
             self.apply_unary(token)
 
             if token.exclam:
@@ -169,18 +536,22 @@ class Lexer:
             token.value = not token.value
 
     @staticmethod
-    def get_string_ending(string):
-        opener = string[0]
+    def find_string_ending(code, opener_index):
+        """
+        returns index of the quote, closing the string, or -1 if string is not closed
+        """
 
-        for index, letter in enumerate(string[1:], start=1):
-            if letter == opener and string[index - 1] != '\\':
-                return string[:index + 1], index
+        opener = code[opener_index]
+        index = code.find(opener, opener_index + 1)
 
-        return string, -1
+        while index != -1 and code[index - 1] == '\\':
+            index = code.find(opener, index + 1)
+
+        return index
 
     @staticmethod
     def provide_token_type(token):
-        if token.type not in (tokentypes.OPERATOR, tokentypes.NO_TYPE):
+        if not token.type & (tokentypes.OPERATOR | tokentypes.NO_TYPE):
             return
 
         if token.value.isdigit():
@@ -198,7 +569,7 @@ class Lexer:
             if token.value in priorities.for_tokens:
                 token.priority = priorities.for_tokens[token.value]
 
-            token.type = operators.characters[token.value]
+            token.type = tokentypes.operators_types[token.value]
 
     def parse_braces(self, context, tokens_):
         opener = None
@@ -243,3 +614,65 @@ class Lexer:
 # lexer = Lexer('"func get_string() { return \\"print(\'passed!\')\\" }"')
 # lexemes = lexer.parse()
 # print(lexemes)
+
+
+def tokenize_piece(piece, lineno):
+    """
+    lexes a piece of code in a worker process. Returns pickled tokens, and whether
+    the piece ends on the top level, so the next piece may begin right after it
+    """
+
+    lexer = Lexer()
+    levels = [BracesLevel(None)]
+
+    try:
+        lexer.feed(piece, None, lineno, levels)
+    except SyntaxError:     # for example, unexpected closing brace, as piece begins inside of braces
+        return None, False
+
+    top_level = levels[0]
+    ends_at_top_level = len(levels) == 1 and not top_level.signs
+
+    if ends_at_top_level and top_level.tokens and top_level.tokens[-1].type == tokentypes.STRING:
+        # unclosed string takes the whole rest of the piece
+        unclosed_string = None
+
+        for line in piece.split('\n'):
+            unclosed_string = lexer.get_unclosed_string(line, unclosed_string)
+
+        ends_at_top_level = unclosed_string is None
+
+    return [pack_token(token) for token in top_level.close()], ends_at_top_level
+
+
+def pack_token(token):
+    """
+    tokens are sent between processes as tuples (and dicts as tuples beginning with None),
+    as pickling tuples is a few times faster than pickling objects
+    """
+
+    if isinstance(token, list):
+        return [pack_token(item) for item in token]
+    if isinstance(token, dict):
+        return None, [(pack_token(key), pack_token(value)) for key, value in token.items()]
+    if not isinstance(token, tokens.BasicToken):
+        return token
+
+    return (token.type, pack_token(token.value), token.unary, token.primary_type,
+            token.priority, token.exclam, token.lineno)
+
+
+def unpack_token(packed, context):
+    if isinstance(packed, list):
+        return [unpack_token(item, context) for item in packed]
+    if not isinstance(packed, tuple):
+        return packed
+    if packed[0] is None:
+        return {unpack_token(key, context): unpack_token(value, context) for key, value in packed[1]}
+
+    type_, value, unary, primary_type, priority, exclam, lineno = packed
+    token = tokens.BasicToken(context, type_, unpack_token(value, context), unary=unary,
+                              exclam=exclam, primary_type=primary_type, lineno=lineno)
+    token.priority = priority
+
+    return token
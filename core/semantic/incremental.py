@@ -0,0 +1,298 @@
+from bisect import bisect_right
+
+from core.semantic import semantic
+from core.lexer.lexer import Lexer, BracesLevel
+from core.utils.tools import tree_children
+from core.utils.tokens import IfBranchLeaf, ElifBranchLeaf, ElseBranchLeaf
+from core.utils.tokentypes import NEWLINE, OPERATOR
+
+# branch leaves are joined to a single branch, so they can't begin a chunk
+BRANCH_LEAVES_CONSTRUCTIONS = (IfBranchLeaf, ElifBranchLeaf, ElseBranchLeaf)
+MAX_CONSTRUCTION_LENGTH = max(map(len, semantic.constructions.values()))
+
+"""
+Source is stored as chunks of lines. Every chunk is lexed and parsed on its own,
+and chunk is the thing that is re-lexed and re-parsed after an edit, while other
+chunks are reused as they are. Only line numbers of their tokens are moved, so every
+chunk keeps a flat list of its tokens and constructions that have line numbers.
+Bodies of functions and classes, that are parsed after the list is made, are added
+to it the next time the chunk is moved.
+
+A chunk begins on a line that begins a construction (excepting branch leaves), and
+previous line ends with all the braces closed. Semantic parser always flushes math
+expressions and branches before such a construction, so parsing chunks one by one
+gives the same tree, as parsing the whole source does
+"""
+
+
+class Chunk:
+    __slots__ = ('start', 'length', 'tokens', 'tree', 'numbered', 'lazy_owners')
+
+    def __init__(self, start, length, tokens, tree):
+        self.start = start  # index of the first line
+        self.length = length
+        self.tokens = tokens
+        self.tree = tree
+        self.numbered = []
+        # functions and classes, which bodies were not parsed yet, when the chunk was collected
+        self.lazy_owners = []
+        collect_numbered((tokens, tree), self.numbered, set(), self.lazy_owners)
+
+    def move(self, delta):
+        """
+        moves line numbers of the chunk by delta lines. Bodies, that were parsed after the chunk
+        was collected, are collected first, as nodes of them are made by the parsing
+        """
+
+        parsed = [owner.parsed_body for owner in self.lazy_owners if owner.lazy_body is None]
+
+        if parsed:
+            self.lazy_owners = [owner for owner in self.lazy_owners if owner.lazy_body is not None]
+            known = set(map(id, self.numbered))
+            numbered = []
+            collect_numbered(parsed, numbered, set(), self.lazy_owners)
+            self.numbered.extend(node for node in numbered if id(node) not in known)
+
+        for node in self.numbered:
+            node.lineno += delta
+
+
+class IncrementalParser:
+    def __init__(self, context, executor, evaluator, source=''):
+        """
+        keeps lexer tokens and semantic tree of the source, updating only the edited
+        parts of them. context, executor and evaluator are the same as semantic.parse takes.
+
+        Trees of unchanged chunks are the same objects between updates, so they are
+        shared by everyone who executes them
+        """
+
+        self.context = context
+        self.executor = executor
+        self.evaluator = evaluator
+        self.lexer = Lexer()
+        self.lines = source.split('\n')
+        self.chunks = None
+
+        self.build()
+
+    @property
+    def source(self):
+        return '\n'.join(self.lines)
+
+    @property
+    def tokens(self):
+        if self.chunks is None:
+            self.build()
+
+        return [token for chunk in self.chunks for token in chunk.tokens]
+
+    @property
+    def tree(self):
+        if self.chunks is None:
+            self.build()
+
+        return [token for chunk in self.chunks for token in chunk.tree]
+
+    def build(self):
+        self.chunks = None
+        _, tokens = self.lex_region(0, len(self.lines))
+        self.chunks = self.split_to_chunks(tokens, 0, len(self.lines))
+
+    def update(self, source):
+        """
+        replaces the whole source (for example, after a file was saved), re-parsing
+        only lines between common beginning and common ending of the old and the new sources
+        """
+
+        new_lines = source.split('\n')
+        start = 0
+        max_start = min(len(self.lines), len(new_lines))
+
+        while start < max_start and self.lines[start] == new_lines[start]:
+            start += 1
+
+        old_end, new_end = len(self.lines), len(new_lines)
+
+        while old_end > start and new_end > start and self.lines[old_end - 1] == new_lines[new_end - 1]:
+            old_end -= 1
+            new_end -= 1
+
+        if start == old_end == len(self.lines) and new_end == len(new_lines):
+            return  # nothing changed
+
+        self.replace_lines(start, old_end, new_lines[start:new_end])
+
+    def edit(self, start, end, text):
+        """
+        replaces text between start and end positions by the new text (as editors do)
+
+        start, end: (line, column), both counting from 0
+        """
+
+        (start_line, start_column), (end_line, end_column) = start, end
+        text = self.lines[start_line][:start_column] + text + self.lines[end_line][end_column:]
+        self.replace_lines(start_line, end_line + 1, text.split('\n'))
+
+    def replace_lines(self, start, end, new_lines):
+        """
+        replaces lines from start till end (not including) by new lines
+        """
+
+        # if something fails, chunks are left None, and the next update re-parses everything
+        chunks, self.chunks = self.chunks, None
+        self.lines[start:end] = new_lines
+
+        if chunks is None:
+            return self.build()
+
+        first = self.chunk_index(chunks, start)
+        last = self.chunk_index(chunks, max(start, end - 1))
+        delta = len(new_lines) - (end - start)
+        region_start = chunks[first].start
+        region_end = chunks[last].start + chunks[last].length + delta
+
+        for chunk in chunks[last + 1:]:
+            chunk.start += delta
+
+        first, last, region_start, region_end, tokens = self.lex_edited_region(chunks, first, last,
+                                                                               region_start, region_end)
+
+        if delta:
+            for chunk in chunks[last + 1:]:
+                chunk.move(delta)
+
+        chunks[first:last + 1] = self.split_to_chunks(tokens, region_start, region_end)
+        self.chunks = chunks
+
+    def lex_edited_region(self, chunks, first, last, region_start, region_end):
+        """
+        lexes lines of the edited chunks, joining neighbour chunks to them until
+        the region begins and ends on chunks bounds
+        """
+
+        while True:
+            try:
+                levels, tokens = self.lex_region(region_start, region_end)
+            except SyntaxError:
+                # for example, unclosed string, that is closed by one of the next chunks
+                if last + 1 == len(chunks):
+                    raise
+
+                levels = tokens = None
+
+            if levels is not None and region_start > 0 and not self.begins_chunk(tokens, 1):
+                first -= 1
+                region_start = chunks[first].start
+            elif levels is None or (last + 1 < len(chunks) and not self.ends_chunk(levels)):
+                last += 1
+                region_end = chunks[last].start + chunks[last].length
+            else:
+                return first, last, region_start, region_end, levels[0].close()
+
+    def lex_region(self, start, end):
+        """
+        lexes lines from start till end (not including) exactly as they are lexed
+        as a part of the whole source. Returns levels of braces, left after lexing, and tokens
+        """
+
+        if end < len(self.lines):
+            # unclosed string takes the whole rest of source, not only the rest of region
+            unclosed_string = None
+
+            for line in self.lines[start:end]:
+                unclosed_string = self.lexer.get_unclosed_string(line, unclosed_string)
+
+            if unclosed_string is not None:
+                raise SyntaxError('unclosed string')
+
+        code = '\n'.join(self.lines[start:end])
+        lineno = start + 1
+
+        if start > 0:
+            # newline that separates this region from the previous one
+            code, lineno = '\n' + code, lineno - 1
+
+        # the last newline of the source is ignored
+        length = len(code) - 1 if end == len(self.lines) and code.endswith('\n') else len(code)
+        levels = [BracesLevel(None)]
+        self.lexer.feed(code, self.lexer.context, lineno, levels, length)
+
+        if end == len(self.lines):
+            self.lexer.finish_levels(levels)
+
+        return levels, levels[0].tokens
+
+    @staticmethod
+    def ends_chunk(levels):
+        """
+        next chunk can begin right after these levels only if all the braces are
+        closed, and there are no signs that would be folded to the next token
+        """
+
+        top_level = levels[0]
+
+        return len(levels) == 1 and not top_level.signs and (
+            not top_level.tokens or top_level.tokens[-1].primary_type != OPERATOR)
+
+    @staticmethod
+    def begins_chunk(tokens, index):
+        if index >= len(tokens) or tokens[index - 1].type != NEWLINE or tokens[index].type == NEWLINE:
+            return False
+        if index > 1 and tokens[index - 2].primary_type == OPERATOR:
+            return False  # unary signs of the previous line may be folded to the newline
+
+        construction, _ = semantic.startswith(tokens[index:index + MAX_CONSTRUCTION_LENGTH])
+
+        return construction is not None and construction not in BRANCH_LEAVES_CONSTRUCTIONS
+
+    def split_to_chunks(self, tokens, region_start, region_end):
+        chunks = []
+        chunk_begin, chunk_start = 0, region_start
+
+        for index in range(2, len(tokens)):
+            if self.begins_chunk(tokens, index):
+                # newline before the chunk belongs to the chunk
+                start = tokens[index - 1].lineno
+                chunks.append(self.parse_chunk(chunk_start, start, tokens[chunk_begin:index - 1]))
+                chunk_begin, chunk_start = index - 1, start
+
+        chunks.append(self.parse_chunk(chunk_start, region_end, tokens[chunk_begin:]))
+
+        return chunks
+
+    def parse_chunk(self, start, end, tokens):
+        tree = semantic.parse(self.context, self.executor, self.evaluator, tokens)
+
+        return Chunk(start, end - start, tokens, tree)
+
+    @staticmethod
+    def chunk_index(chunks, line):
+        starts = [chunk.start for chunk in chunks]
+
+        return max(bisect_right(starts, line) - 1, 0)
+
+
+def collect_numbered(tree, numbered, visited, lazy_owners):
+    """
+    collects every token and construction of the tree, that has a line number, and
+    functions and classes, which bodies are not parsed yet
+    """
+
+    if id(tree) in visited or isinstance(tree, (str, int, float, bool, type(None))):
+        return
+
+    visited.add(id(tree))
+
+    if not isinstance(tree, (list, tuple, dict)) and isinstance(getattr(tree, 'lineno', None), int):
+        numbered.append(tree)
+
+    for item in tree_children(tree):
+        collect_numbered(item, numbered, visited, lazy_owners)
+
+    # tokens of a body, that is not parsed yet, are not the children of its owner
+    lazy_body = getattr(tree, 'lazy_body', None)
+
+    if lazy_body is not None:
+        lazy_owners.append(tree)
+        collect_numbered(lazy_body.tokens, numbered, visited, lazy_owners)
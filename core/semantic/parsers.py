@@ -1,10 +1,19 @@
-from core.utils.tokens import BasicToken
+import os
+from functools import partial
+
+from core.utils.tokens import BasicToken, LazyBody
+from core.utils.expressions import Expression
 from core.utils.datatypes_classes import List, Dict, Tuple
 from core.utils.tools import parse_func_args, split_tokens, process_token
 from core.utils.tokentypes import (SEMICOLON, MATHEXPR, PARENTHESIS,
                                    LIST, DICT, NEWLINE)
 
-TOKEN_TYPES_FOR_SEMANTIC_ANALYZE = (MATHEXPR, LIST, DICT)
+TOKEN_TYPES_FOR_SEMANTIC_ANALYZE = MATHEXPR | LIST | DICT
+# smaller bodies are parsed at once, as parsing them costs less than keeping their tokens
+MIN_LAZY_BODY_TOKENS = 16
+# bodies of functions and classes are parsed when they are defined, so all syntax errors are
+# found before the execution
+eager_bodies = bool(os.environ.get('LOTUSEAGERPARSE'))
 
 
 def function_call(executor, evaluator, context, semantic_parser, tokens):
@@ -28,19 +37,42 @@ def function_assign(executor, evaluator, context, semantic_parser, tokens):
     if args and args[0].type == MATHEXPR:
         args = []
 
-    return executor, name.value, args, kwargs, semantic_parser(context, executor, evaluator, code.value)
+    return executor, name.value, args, kwargs, parse_body(executor, evaluator, context, semantic_parser, code.value)
 
 
 def class_assign(executor, evaluator, context, semantic_parser, tokens):
     _, name, body = tokens
 
-    return context, executor, name.value, semantic_parser(context, executor, evaluator, body.value)
+    return context, executor, name.value, parse_body(executor, evaluator, context, semantic_parser, body.value)
+
+
+def parse_body(executor, evaluator, context, semantic_parser, tokens):
+    """
+    body is parsed when it is used first time, unless it is small, or bodies are parsed eagerly
+    """
+
+    if eager_bodies or count_tokens(tokens) < MIN_LAZY_BODY_TOKENS:
+        return semantic_parser(context, executor, evaluator, tokens)
+
+    return LazyBody(partial(semantic_parser, context, executor, evaluator), tokens)
+
+
+def count_tokens(tokens):
+    count = 0
+
+    for token in tokens:
+        if isinstance(token, list):     # items of collections are lists of tokens
+            count += count_tokens(token)
+        else:
+            count += 1 + (count_tokens(token.value) if isinstance(token.value, list) else 0)
+
+    return count
 
 
 def if_elif_branch(executor, evaluator, context, semantic_parser, tokens):
     _, expr, code = tokens
 
-    return expr.value, semantic_parser(context, executor, evaluator, code.value)
+    return Expression(expr.value), semantic_parser(context, executor, evaluator, code.value)
 
 
 def else_branch(executor, evaluator, context, semantic_parser, tokens):
@@ -52,7 +84,7 @@ def else_branch(executor, evaluator, context, semantic_parser, tokens):
 def for_loop(executor, evaluator, context, semantic_parser, tokens):
     _, start_end_step, code = tokens
     start, end, step = map(lambda item: semantic_parser(context, executor, evaluator, item),
-                           split_tokens(start_end_step.value, (SEMICOLON,)))
+                           split_tokens(start_end_step.value, SEMICOLON))
     start, step = start[0], step[0]
 
     return executor, evaluator, start, end, step, semantic_parser(context, executor, evaluator, code.value)
@@ -61,7 +93,7 @@ def for_loop(executor, evaluator, context, semantic_parser, tokens):
 def while_loop(executor, evaluator, context, semantic_parser, tokens):
     _, expr, code = tokens
 
-    return executor, evaluator, expr.value, semantic_parser(context, executor, evaluator, code.value)
+    return executor, evaluator, Expression(expr.value), semantic_parser(context, executor, evaluator, code.value)
 
 
 def var_assign(executor, evaluator, context, semantic_parser, tokens):
@@ -78,7 +110,7 @@ def execute_code(executor, evaluator, context, semantic_parser, tokens):
     if code.type == MATHEXPR:
         code = code.value[0]
 
-    return executor, lambda _tokens: semantic_parser(context, executor, evaluator, _tokens), code
+    return executor, partial(semantic_parser, context, executor, evaluator), code
 
 
 def evaluate_code(executor, evaluator, context, semantic_parser, tokens):
@@ -88,7 +120,7 @@ def evaluate_code(executor, evaluator, context, semantic_parser, tokens):
     if code.type == MATHEXPR:
         code = code.value[0]
 
-    return evaluator, lambda _tokens: semantic_parser(context, executor, evaluator, _tokens), code
+    return evaluator, partial(semantic_parser, context, executor, evaluator), code
 
 
 def return_token(executor, evaluator, context, semantic_parser, tokens):
@@ -135,7 +167,7 @@ def _parse_args(context, executor, evaluator, args, parse_semantic):
     output = []
 
     for arg in args:
-        if arg.type in TOKEN_TYPES_FOR_SEMANTIC_ANALYZE:
+        if arg.type & TOKEN_TYPES_FOR_SEMANTIC_ANALYZE:
             if len(arg.value) == 0:
                 continue
 
@@ -166,7 +198,7 @@ def parse_list(executor, evaluator, context, semantic_parser, token):
 
         token.value[index] = parsed_value
 
-    return List(evaluator, token)
+    return as_literal(List(evaluator, token))
 
 
 def parse_tuple(executor, evaluator, context, semantic_parser, token):
@@ -210,4 +242,11 @@ def parse_dict(executor, evaluator, context, semantic_parser, token):
 
     token.value = cooked_dict
 
-    return Dict(evaluator, token)
+    return as_literal(Dict(evaluator, token))
+
+
+def as_literal(collection):
+    # evaluator gives a new copy of the literal every time, as it is changed by its methods
+    collection.literal = True
+
+    return collection
@@ -1,5 +1,5 @@
-from core.utils.operators import characters
 from core.utils.tools import get_token_index
+from core.utils.expressions import Expression
 from core.utils.tokens import (Function, VarAssign, ForLoop, WhileLoop,
                                IfBranchLeaf, ElifBranchLeaf, ElseBranchLeaf,
                                FunctionCall, BasicToken, ReturnStatement,
@@ -13,10 +13,11 @@ from core.utils.keywords import (IF_KEYWORD, ELIF_KEYWORD, ELSE_KEYWORD,
                                  IMPORT_KEYWORD, AS_KEYWORD, CLASSASSIGN_KEYWORD,
                                  EXEC_KEYWORD, EVAL_KEYWORD, TRY_KEYWORD,
                                  EXCEPT_KEYWORD, PYIMPORT_KEYWORD)
-from core.utils.tokentypes import (VARIABLE, BRACES, FBRACES,
-                                   ANY, NEWLINE, MATHEXPR,
+from core.utils.tokentypes import (VARIABLE, BRACES, FBRACES, OPERATOR,
+                                   ANY, NEWLINE, MATHEXPR, EQUAL, COMMA,
                                    IF_BLOCK, ELIF_BLOCK, ELSE_BLOCK,
-                                   STRING, LIST, DICT, TUPLE)
+                                   STRING, LIST, DICT, TUPLE, BRANCH_LEAVES,
+                                   as_mask, type_names)
 from core.semantic.parsers import (if_elif_branch, else_branch,
                                    function_call, function_assign,
                                    for_loop, while_loop, var_assign,
@@ -27,29 +28,30 @@ from core.semantic.parsers import (if_elif_branch, else_branch,
 
 
 class MatchToken:
-    def __init__(self, *match_token_types, primary_types=tuple(), value=None):
-        if not isinstance(primary_types, tuple):
-            primary_types = (primary_types,)
-
-        self.types = match_token_types
-        self.primary_types = primary_types
+    def __init__(self, *match_token_types, primary_types=0, value=None):
+        # both types and primary_types are masks
+        self.types = as_mask(match_token_types)
+        self.primary_types = as_mask(primary_types)
         self.value = value
 
     def match(self, another_token):
-        if another_token.primary_type in self.primary_types and ANY in self.types:
+        if self.types & ANY:
             return True
 
-        return ANY in self.types or another_token.type in self.types or another_token.value == self.value
+        return another_token.type & self.types or another_token.value == self.value
 
     def __str__(self):
-        return f'MatchToken(types={self.types}, primary_types={self.primary_types})'
+        types = [name for type_, name in type_names.items() if type_ & self.types]
+        primary_types = [name for type_, name in type_names.items() if type_ & self.primary_types]
+
+        return f'MatchToken(types={types}, primary_types={primary_types})'
 
 
 constructions = {
     Function: (
         MatchToken(FUNCASSIGN_KEYWORD), MatchToken(VARIABLE), MatchToken(BRACES, TUPLE),  MatchToken(FBRACES)),
     Class: (MatchToken(CLASSASSIGN_KEYWORD), MatchToken(VARIABLE), MatchToken(FBRACES)),
-    VarAssign: (MatchToken(VARIABLE, BRACES, TUPLE), MatchToken(characters['=']), MatchToken(ANY)),
+    VarAssign: (MatchToken(VARIABLE, BRACES, TUPLE), MatchToken(EQUAL), MatchToken(ANY)),
     ForLoop: (MatchToken(FOR_LOOP_KEYWORD), MatchToken(BRACES), MatchToken(FBRACES)),
     WhileLoop: (MatchToken(WHILE_LOOP_KEYWORD), MatchToken(BRACES), MatchToken(FBRACES)),
     IfBranchLeaf: (MatchToken(IF_KEYWORD), MatchToken(BRACES), MatchToken(FBRACES)),
@@ -93,12 +95,27 @@ token_types_parsers = {
 READ_TOKENS_TILL_NEWLINE = (VarAssign, ExecuteCode, EvaluateCode, ReturnStatement)
 
 
+def build_dispatch_index():
+    """
+    maps type of the first token to constructions, that may begin with a token of this
+    type (in the same order, as they are in constructions), so startswith does not try
+    the rest of them
+    """
+
+    return {type_: [(construction, match_tokens) for construction, match_tokens in constructions.items()
+                    if match_tokens[0].types & (type_ | ANY)] for type_ in type_names}
+
+
+dispatch_index = build_dispatch_index()
+
+
 def match(original, match_list, ignore=()):
+    ignore = as_mask(ignore)
     current_match_token_index = 0
     matched = []
 
     for token in original:
-        if token.type in ignore or token.primary_type in ignore:
+        if (token.type | token.primary_type) & ignore:
             continue
 
         if not match_list[current_match_token_index].match(token):
@@ -117,13 +134,21 @@ def match(original, match_list, ignore=()):
     return matched
 
 
-def startswith(tokens):
-    for construction_name, construction_match_tokens in constructions.items():
-        match_result = match(tokens[:len(construction_match_tokens)], construction_match_tokens, ignore=(NEWLINE,))
+def startswith(tokens, index=0):
+    """
+    returns construction, that begins at the index of tokens, and its tokens
+    """
+
+    if index >= len(tokens):
+        return None, None
+
+    for construction_name, construction_match_tokens in dispatch_index.get(tokens[index].type, ()):
+        match_result = match(tokens[index:index + len(construction_match_tokens)], construction_match_tokens,
+                             ignore=NEWLINE)
 
         if match_result:
             if construction_name in READ_TOKENS_TILL_NEWLINE:
-                match_result = tokens[:get_token_index(tokens, NEWLINE)]
+                match_result = tokens[index:get_token_index(tokens, NEWLINE, index)]
 
             return construction_name, match_result
 
@@ -135,17 +160,20 @@ def branches_leaves_to_branches_trees(executor, evaluator, tokens):
     output_tokens = []
 
     for token in tokens:
-        if token.type in (IF_BLOCK, ELIF_BLOCK, ELSE_BLOCK):
-            if temp_branch is None:
-                if token.type != IF_BLOCK:
-                    raise SyntaxError('Found elif/else statement, but no if statements found')
-
-                temp_branch = Branch(executor, evaluator, token)
+        if token.type == IF_BLOCK:
+            # if statement right after a branch starts a new one
+            if temp_branch:
+                output_tokens.append(temp_branch)
+
+            temp_branch = Branch(executor, evaluator, token)
+        elif token.type & BRANCH_LEAVES:
+            if temp_branch is None or temp_branch.else_expr is not None:
+                raise SyntaxError('Found elif/else statement, but no if statements found')
+
+            if token.type == ELIF_BLOCK:
+                temp_branch.elif_exprs.append(token)
             else:
-                if temp_branch.type == ELIF_BLOCK:
-                    temp_branch.elif_exprs.append(token)
-                else:
-                    temp_branch.else_expr = token
+                temp_branch.else_expr = token
         elif temp_branch:
             output_tokens.extend((temp_branch, token))
             temp_branch = None
@@ -159,37 +187,105 @@ def branches_leaves_to_branches_trees(executor, evaluator, tokens):
 
 
 def parse(context, executor, evaluator, tokens):
-    temp = parse_tokens(context, executor, evaluator, tokens=tokens[:])
+    """
+    tokens: list of tokens, or an iterable of them (for example, Lexer.parse_stream()).
+    Iterable is parsed line by line, so only tokens of the current line are kept
+    """
+
     temp_math_expr_tokens = []
     output_tokens = []
+    lines = (tokens,) if isinstance(tokens, list) else split_lines(tokens)
 
-    while temp:
-        construction, tokens = startswith(temp)
+    for line in lines:
+        temp = fold_calls(context, executor, evaluator, parse_tokens(context, executor, evaluator, tokens=line))
+        # index of the first token, that is not parsed yet
+        cursor = 0
 
-        if construction is None:
-            value = temp.pop(0)
+        while cursor < len(temp):
+            construction, tokens = startswith(temp, cursor)
 
-            if value.type != NEWLINE:
-                temp_math_expr_tokens.append(value)
-        else:
-            if temp_math_expr_tokens:
-                token = BasicToken(context, MATHEXPR, temp_math_expr_tokens[:])
-                output_tokens.append(token)
-                temp_math_expr_tokens.clear()
+            if construction is None:
+                value = temp[cursor]
+                cursor += 1
+
+                if value.type != NEWLINE:
+                    temp_math_expr_tokens.append(value)
+            else:
+                if temp_math_expr_tokens:
+                    token = BasicToken(context, MATHEXPR, Expression(temp_math_expr_tokens))
+                    output_tokens.append(token)
+                    temp_math_expr_tokens = []
 
-            parser = parsers[construction]
-            construction_args = parser(executor, evaluator, context, parse, tokens)
-            parsed_construction = construction(*(construction_args + (tokens[-1].lineno,)))
-            output_tokens.append(parsed_construction)
-            temp = temp[len(tokens):]
+                parser = parsers[construction]
+                construction_args = parser(executor, evaluator, context, parse, tokens)
+                parsed_construction = construction(*(construction_args + (tokens[-1].lineno,)))
+                output_tokens.append(parsed_construction)
+                cursor += len(tokens)
 
     if temp_math_expr_tokens:
-        token = BasicToken(context, MATHEXPR, temp_math_expr_tokens)
+        token = BasicToken(context, MATHEXPR, Expression(temp_math_expr_tokens))
         output_tokens.append(token)
 
     return branches_leaves_to_branches_trees(executor, evaluator, output_tokens)
 
 
+def split_lines(tokens):
+    """
+    yields tokens by lines, every line ends with its newline token. Constructions
+    never match tokens after a newline, so lines are parsed one by one
+    """
+
+    line = []
+
+    for token in tokens:
+        line.append(token)
+
+        if token.type == NEWLINE:
+            yield line
+            line = []
+
+    if line:
+        yield line
+
+
+def fold_calls(context, executor, evaluator, tokens, operands=False):
+    """
+    replaces calls, that are operands of an expression, by function call tokens, so the
+    expression is compiled with them as leaves (and a call after && or || is skipped,
+    when the result is already known). In a statement only a call next to an operator
+    is an operand, others are left to constructions (print(x), x = f(x) and so on).
+    In braces (conditions of if, while, etc.) every call is an operand
+    """
+
+    output = []
+
+    for index, token in enumerate(tokens):
+        previous = output[-1] if output else None
+
+        if is_call_name(previous) and token.type & (BRACES | TUPLE) and (
+                operands or is_operator(output[-2] if len(output) > 1 else None)
+                or is_operator(tokens[index + 1] if index + 1 < len(tokens) else None)):
+            name = output.pop()
+            call_args = function_call(executor, evaluator, context, parse, (name, token))
+            output.append(FunctionCall(*(call_args + (token.lineno,))))
+        else:
+            if token.type == BRACES and not is_call_name(previous):
+                token.value = fold_calls(context, executor, evaluator, token.value, operands=True)
+
+            output.append(token)
+
+    return output
+
+
+def is_call_name(token):
+    return token is not None and type(token) is BasicToken and token.type == VARIABLE
+
+
+def is_operator(token):
+    # commas and assignments separate expressions, but are not their operators
+    return token is not None and token.primary_type == OPERATOR and token.type not in (EQUAL, COMMA)
+
+
 def parse_tokens(*args, tokens):
     return list(map(lambda token: parse_token(*args, token), tokens))
 
@@ -0,0 +1,31 @@
+"""
+execution time of a program, that calls a function with variable, constant and
+expression arguments many times
+"""
+
+from io import StringIO
+from time import perf_counter
+from contextlib import redirect_stdout
+
+from core.interpreter.interpreter import interpret
+
+source = '''
+func add(a, b, c) {
+    r = a + b
+    return r + c
+}
+total = 0
+for (i = 0; i < 20000; i = i + 1) {
+    s = add(i, 2, total % 7)
+    total = total + s
+}
+print(total)
+'''
+
+output = StringIO()
+begin = perf_counter()
+
+with redirect_stdout(output):
+    interpret(source, exit_after_execution=False)
+
+print(f'calls: 20000, time: {perf_counter() - begin:.3f}s, output: {output.getvalue().strip()}')
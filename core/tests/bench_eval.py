@@ -0,0 +1,41 @@
+"""
+evaluation time and memory peak of math expressions, that are parsed once and evaluated many times
+(as expressions of loops and functions bodies are)
+"""
+
+import tracemalloc
+from time import perf_counter
+
+from core.lexer.lexer import Lexer
+from core.semantic import semantic
+from core.interpreter.eval import evaluate
+from core.interpreter.interpreter import execute
+from core.utils.contexts import Context
+
+exprs = (
+    'a + b',
+    'a * 2 + b * 3 - (a - b) ** 2',
+    '(a + 1) * (b + 2) / (a + b) + a % 3 - b // 2 + (a > b) + (a <= b)',
+    ' + '.join(f'a * {index}' for index in range(50)),
+)
+repeats = 10_000
+
+for expr in exprs:
+    context = Context()
+    context['a'], context['b'] = 7, 3
+    mathexpr = semantic.parse(context, execute, evaluate, Lexer(expr).parse())[0]
+
+    begin = perf_counter()
+
+    for _ in range(repeats):
+        evaluate(mathexpr.value, context)
+
+    elapsed = perf_counter() - begin
+
+    tracemalloc.start()
+    evaluate(mathexpr.value, context)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f'tokens: {len(mathexpr.value)}, per evaluation: {elapsed / repeats * 1e6:.2f}us, '
+          f'memory peak: {peak} bytes')
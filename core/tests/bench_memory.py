@@ -0,0 +1,83 @@
+"""
+bytes per token of the lexer output: compact (__slots__) tokens against the same
+tokens stored with an instance __dict__, as they were before. And peak memory of
+parsing a file, when all its tokens are lexed first against parsing the lexer stream
+"""
+
+import tracemalloc
+from io import StringIO
+from sys import getsizeof
+
+from core.lexer.lexer import Lexer
+from core.semantic import semantic
+from core.interpreter.interpreter import execute
+from core.interpreter.eval import evaluate
+from core.utils.contexts import Context
+from core.utils.tokens import BasicToken
+
+
+class DictToken:
+    def __init__(self, token):
+        self.context = token.context
+        self.type = token.type
+        self.value = token.value
+        self.unary = token.unary
+        self.primary_type = token.primary_type
+        self.priority = token.priority
+        self.exclam = token.exclam
+        self.lineno = token.lineno
+
+
+def slotted_token(token):
+    clone = BasicToken(token.context, token.type, token.value, unary=token.unary,
+                       exclam=token.exclam, primary_type=token.primary_type, lineno=token.lineno)
+    clone.priority = token.priority
+
+    return clone
+
+
+def flatten(tokens):
+    for token in tokens:
+        yield token
+
+        if isinstance(token.value, list):
+            for item in token.value:
+                yield from flatten(item if isinstance(item, list) else [item])
+
+
+def bytes_per_token(make_token, tokens):
+    tracemalloc.start()
+    begin = tracemalloc.get_traced_memory()[0]
+    made = [make_token(token) for token in tokens]
+    used = tracemalloc.get_traced_memory()[0] - begin - getsizeof(made)
+    tracemalloc.stop()
+
+    return used / len(made)
+
+
+def parsing_peak(source, stream):
+    tracemalloc.start()
+    tokens = Lexer().parse_stream(StringIO(source))
+
+    if not stream:
+        tokens = list(tokens)
+
+    semantic.parse(Context(), execute, evaluate, tokens)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return peak
+
+
+with open('./examples/simple_program_demo.lt') as example_fd:
+    example = example_fd.read()
+
+source = example * 2000
+
+lexemes = list(flatten(Lexer(source).parse()))
+
+print('lines:', source.count('\n'), 'tokens:', len(lexemes))
+print('bytes per token (__dict__):', round(bytes_per_token(DictToken, lexemes), 1))
+print('bytes per token (__slots__):', round(bytes_per_token(slotted_token, lexemes), 1))
+print('parsing peak, KB (token list):', parsing_peak(example * 200, stream=False) // 1024)
+print('parsing peak, KB (token stream):', parsing_peak(example * 200, stream=True) // 1024)
@@ -0,0 +1,29 @@
+"""
+semantic parse time of a block, growing from 1k to 1M statements: time per
+statement has to stay the same (parse is linear in the length of block)
+"""
+
+from time import perf_counter
+
+from core.lexer.lexer import Lexer
+from core.semantic import semantic
+from core.interpreter.eval import evaluate
+from core.interpreter.interpreter import execute
+from core.utils.contexts import Context
+
+statements = (
+    'x = 1 + 2',
+    'print(x, y)',
+    'x + 5',
+    'if (x > 2) {\n    y = [x, 2]\n}',
+)
+
+for count in (1_000, 10_000, 100_000, 1_000_000):
+    source = '\n'.join(statements[index % len(statements)] for index in range(count))
+    lexemes = Lexer(source).parse()
+
+    begin = perf_counter()
+    semantic.parse(Context(), execute, evaluate, lexemes)
+    elapsed = perf_counter() - begin
+
+    print(f'statements: {count}, parse: {elapsed:.3f}s, per statement: {elapsed / count * 1e6:.2f}us')
@@ -0,0 +1,155 @@
+from core.tests.tools import run, get_changes
+
+sources = {
+    'unreachable code': ('''
+func f(n) {
+    for (i = 0; i < n; i = i + 1) {
+        if (i == 2) {
+            return i
+            print("after return")
+        }
+        continue
+        print("after continue")
+    }
+    return 0
+}
+print(f(5))
+print(f(1))
+''', 3),
+    'constant conditions': ('''
+if (0) {
+    print("never")
+} else {
+    print("else")
+}
+while (false) {
+    print("never")
+}
+for (j = 5; 0; j = j + 1) {
+    print("never")
+}
+print(j)
+''', 3),
+    'reassigned constant name': ('''
+false = 1
+if (false) {
+    print("false is true")
+}
+''', 0),
+    'jump table': ('''
+func name(kind) {
+    if (kind == "a") {
+        return "A"
+    } elif ("b" == kind) {
+        return "B"
+    } elif (kind == 1) {
+        return "one"
+    } elif (kind == 1.0) {
+        return "one again"
+    } else {
+        return "other"
+    }
+}
+print(name("b"))
+print(name(true))
+print(name([1]))
+x = 2
+if (x == 1) {
+    print("not a chain")
+} elif (x > 1) {
+    print("not a chain")
+}
+''', 1),
+    'counted loops': ('''
+n = 3
+total = 0
+for (i = 10; i >= n; i = i - 3) {
+    total = total + i
+}
+print(total, i)
+for (k = 0; k < n * 2; k = k + 1) {
+    if (k == 4) {
+        break
+    }
+}
+print(k)
+for (a = 0; a < 3; a = a + 1) {
+    a = a + 1
+}
+for (f = 0.5; f <= 2; f = f + 1) {
+    print(f)
+}
+for (e = 5; e < 3; e = e + 1) {
+    print(e)
+}
+print(a, f, e)
+''', 4),
+    'loop bound changed by a call': ('''
+n = 5
+func shrink() {
+    global.n = 2
+}
+for (i = 0; i < n; i = i + 1) {
+    shrink()
+    print(i)
+}
+print(i)
+m = 3
+func grow() {
+    m = 10
+    return 1
+}
+for (j = 0; j < m; j = j + 1) {
+    r = grow()
+}
+print(j)
+''', 1),
+    'loop invariants': ('''
+k = 4
+i = 0
+total = 0
+while (i < 5) {
+    square = k * k
+    total = total + square + i
+    i = i + 1
+}
+print(total, square, i)
+
+n = 0
+while (n < 0) {
+    never = 1
+}
+print(never)
+''', 3),
+    'loop variants': ('''
+x = 0
+y = 0
+while (x < 3) {
+    z = y
+    y = x * 2
+    x = x + 1
+}
+print(x, y, z)
+
+try {
+    t = 0
+    while (t < 2) {
+        u = 1 / 0
+        t = t + 1
+    }
+} except {
+    print("caught", u)
+}
+''', 0),
+}
+
+
+for name, (source, expected_changes) in sources.items():
+    optimized, not_optimized = run(source), run(source, optimize=False)
+    changes = len(get_changes(source))
+
+    if optimized != not_optimized:
+        print(name, f'failed (output: {optimized!r}, should be: {not_optimized!r})')
+    else:
+        print(name, 'passed' if changes == expected_changes else
+              f'failed (changes: {changes}, should be: {expected_changes})')
@@ -0,0 +1,66 @@
+from time import perf_counter
+
+from core.utils.codecache import cache, DEFAULT_SIZE
+from core.tests.tools import get_output, interpret_source
+
+source = '''
+formulas = ["x * 2 + 1", "x ** 2", "(x + 1) * (x - 1)"]
+total = 0
+for (i = 0; i < 30; i = i + 1) {
+    x = i
+    formula = formulas.get(i % 3)
+    value = eval formula
+    exec "items = []\nitems.append(x)\nfunc twice(v) { return v * 2 }"
+    doubled = twice(items.get(0))
+    total = total + value + doubled
+}
+print(total)
+'''
+
+
+def run(code, size):
+    cache.resize(size)
+    cache.clear()
+
+    return get_output(interpret_source, code)
+
+
+cached, not_cached = run(source, DEFAULT_SIZE), run(source, 0)
+print('cached trees are re-run', 'passed' if cached == not_cached and cached.strip() else
+      f'failed:\n{cached}\nshould be:\n{not_cached}')
+
+run(source, DEFAULT_SIZE)
+print('hits and misses', 'passed' if (cache.hits, cache.misses) == (56, 4) else
+      f'failed: {cache.hits} hits, {cache.misses} misses, should be 56 and 4')
+
+# every formula is dropped before it is used again, but the exec code is used every time
+run(source, 2)
+print('least recently used is dropped', 'passed' if len(cache.trees) == 2 and cache.hits == 29 else
+      f'failed: {len(cache.trees)} trees, {cache.hits} hits')
+
+output = run('''
+for (i = 0; i < 3; i = i + 1) {
+    exec "d = {'i': i}"
+    print(d.get('i'))
+}
+''', DEFAULT_SIZE)
+print('dict literals are not cached', 'passed' if output == '0\n1\n2\n' and not cache.trees else
+      f'failed:\n{output}')
+
+benchmark = '''
+total = 0
+for (i = 0; i < 5000; i = i + 1) {
+    x = i
+    value = eval "(x + 1) * (x - 1) + x % 7"
+    total = total + value
+}
+print(total)
+'''
+
+for size in (0, DEFAULT_SIZE):
+    begin = perf_counter()
+    run(benchmark, size)
+    print(f'{"cached" if size else "not cached"}: {perf_counter() - begin:.3f}s')
+
+cache.resize(DEFAULT_SIZE)
+cache.clear()
@@ -0,0 +1,103 @@
+from time import perf_counter
+
+from core.tests.tools import run, get_changes
+from core.utils.contexts import main_context
+
+ITEM = '''
+class Item {
+    func __init__(self, price, qty) {
+        self.price = price
+        self.qty = qty
+    }
+}
+'''
+
+# source: number of eliminations
+sources = {
+    'in expression': (ITEM + '''
+o = Item(3, 4)
+if (o.price * o.qty > 10 && o.price * o.qty < 100) {
+    print("in range")
+}
+x = 7
+print(x * x - x)
+''', 2),
+    'between assignments': (ITEM + '''
+o = Item(3, 4)
+a = o.price * o.qty + 1
+b = o.price * o.qty - 1
+c = (o.price * o.qty) * 2
+print(a, b, c)
+func total(it, n) {
+    s = it.price * it.qty * n
+    t = it.price * it.qty + n
+    return s + t
+}
+print(total(o, 2))
+''', 2),
+    'right operands of && and ||': ('''
+x = 0
+y = 2
+a = x != 0 && 10 / x * y
+b = y * y > 1 && y * y || y * y
+c = (x == 0 || 10 / x) + (x == 0 || 10 / x)
+print(a, b, c)
+''', 5),
+    'not eliminated': (ITEM + '''
+o = Item(3, 4)
+a = o.price * o.qty
+o.qty = 5
+b = o.price * o.qty
+p = o
+c = o.price * o.qty + 1
+p.price = 1
+d = o.price * o.qty + 1
+e = (o.price + 1) === (o.price + 1)
+f = o.price + o.qty || 0
+g = o.price + o.qty || 1
+print(a, b, c, d, e, f, g)
+func get() {
+    o.qty = 0
+    return 1
+}
+h = o.price * o.qty + get()
+k = o.price * o.qty + 1
+print(h, k)
+''', 0),
+}
+
+
+for name, (source, expected_eliminations) in sources.items():
+    optimized, not_optimized = run(source), run(source, optimize=False)
+    eliminations = sum('common subexpression' in change for change in get_changes(source))
+
+    if optimized != not_optimized:
+        print(name, f'failed (output: {optimized!r}, should be: {not_optimized!r})')
+    else:
+        print(name, 'passed' if eliminations == expected_eliminations else
+              f'failed (eliminations: {eliminations}, should be: {expected_eliminations})')
+
+# temporaries of the main program are deleted after they are used
+run(sources['between assignments'][0])
+temporaries = [name for name in main_context.variables if '@' in name]
+print('temporaries are deleted', 'passed' if not temporaries else f'failed (left: {temporaries})')
+
+benchmark = ITEM + '''
+o = Item(3, 4)
+total = 0
+i = 0
+while (i < 20000) {
+    a = o.price * o.qty + i
+    b = o.price * o.qty - i
+    if (o.price * o.qty > 10 && o.price * o.qty < 100) {
+        total = total + a + b
+    }
+    i = i + 1
+}
+print(total)
+'''
+
+for optimize in (False, True):
+    begin = perf_counter()
+    run(benchmark, optimize)
+    print(f'{"optimized" if optimize else "not optimized"}: {perf_counter() - begin:.3f}s')
@@ -1,7 +1,12 @@
+import tracemalloc
 from math import pi
 
 from core.lexer.lexer import Lexer
 from core.interpreter.eval import evaluate
+from core.interpreter import optimizer
+from core.interpreter.optimizer import optimize
+from core.utils.expressions import Expression
+from core.tests.tools import run
 
 
 exprs = (
@@ -23,6 +28,19 @@ exprs = (
     '(-5)',
     '-(1+x)',
     '---1',
+    '1+2*3+4',
+    '10-2*3-1',
+    '(1+2)*3-4/2+5%3',
+    'x*2+x**2*3-1',
+    '60*60*24',
+    '!(1>2)',
+    'x+-(2+2)*3',
+    '(2+3)**2*x',
+    # right operand, which is not evaluated, would divide by zero
+    'x > 9 && x / 0',
+    'x || 1 / 0',
+    '0 && x / 0 || x * 2',
+    '1 && (x || x % 0) && 0',
 )
 
 x = 5
@@ -32,6 +50,55 @@ for expr in exprs:
     print(expr, end=' ')
     lexemes = lexer.parse(expr)
     evaluated = evaluate(lexemes, context={'pi': pi, 'x': x})
-    should_be = eval(expr)
-    print('=', evaluated, 'passed' if evaluated == should_be else f'failed (should be: {should_be})')
+    # the same expression after constant folding
+    optimized = evaluate(optimize(Expression(lexer.parse(expr)), context={}), context={'pi': pi, 'x': x})
+    should_be = eval(expr.replace('!', 'not ').replace('&&', 'and').replace('||', 'or'))
+    print('=', evaluated, 'passed' if evaluated == optimized == should_be else
+          f'failed (should be: {should_be}, optimized: {optimized})')
 # print(evaluate(lexer.parse("-pi"), context={'pi': pi}))
+
+# repetitions, which results would be too long, are left to runtime, and are not even made
+# by the optimizer (expression: length after folding)
+repetitions = {
+    "'ab' * 3": 1 if optimizer.enabled else 3,
+    "'a' * 100000000": 3,
+    "100000000 * 'ab'": 3,
+    "'a' * (10000 * 10000)": 3,
+}
+
+for expr, length in repetitions.items():
+    tracemalloc.start()
+    optimized = optimize(Expression(lexer.parse(expr)), context={})
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(expr, 'passed' if len(optimized) == length and peak < 1 << 20 else
+          f'failed (folded to: {optimized}, peak memory: {peak})')
+
+# calls, that are right operands, are called only when the result depends on them
+calls_source = '''
+func check(v) {
+    print("check", v)
+    return v > 1
+}
+func side(v) {
+    print("side", v)
+    return v
+}
+x = null
+if (x != null && check(x)) { print("bad") } else { print("skipped") }
+x = 5
+if (x != null && check(x)) { print("called") }
+a = false
+r = a && side(1)
+print(r)
+r = !a || side(2)
+print(r)
+r = a || side(3) + 1
+print(r)
+'''
+calls_output = 'skipped\ncheck 5\ncalled\nFalse\nTrue\nside 3\n4\n'
+
+for optimize_ in (False, True):
+    output = run(calls_source, optimize_)
+    print('calls as right operands', 'passed' if output == calls_output else
+          f'failed (output: {output!r}, should be: {calls_output!r})')
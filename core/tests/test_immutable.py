@@ -0,0 +1,96 @@
+from core.interpreter import optimizer
+from core.interpreter.interpreter import execute
+from core.interpreter.eval import evaluate
+from core.semantic import semantic
+from core.lexer.lexer import Lexer
+from core.utils.contexts import main_context
+from core.tests.tools import get_output
+
+# source: output of a single run
+sources = {
+    'returns': ('''
+func count(n) {
+    if (n < 1) {
+        return 0
+    }
+    r = count(n - 1)
+    return r + 1
+}
+print(count(3))
+print(count(5))
+''', '3\n5\n'),
+    'unaries and exclams': ('''
+for (i = 0; i < 3; i = i + 1) {
+    print(-(2), !(0))
+}
+''', '-2 True\n-2 True\n-2 True\n'),
+    'list literals': ('''
+func make(x) {
+    items = []
+    items.append(x)
+    return items
+}
+print(make(1))
+print(make(2))
+''', '[1]\n[2]\n'),
+    'nested list literals': ('''
+func make(x) {
+    items = [[0]]
+    first = items.get(0)
+    first.append(x)
+    return items
+}
+print(make(1))
+print(make(2))
+''', '[[INTEGER(0), INTEGER(1)]]\n[[INTEGER(0), INTEGER(2)]]\n'),
+    'collections got by get': ('''
+d = {'a': [1]}
+x = d.get('a')
+x.append(2)
+print(d)
+m = [[1], [2]]
+for (i = 0; i < 2; i = i + 1) {
+    row = m.get(i)
+    row.append(i)
+}
+print(m)
+''', "{'a': [1, 2]}\n[[INTEGER(1), INTEGER(0)], [INTEGER(2), INTEGER(1)]]\n"),
+    'methods': ('''
+class Box {
+    func __init__(self, v) {
+        self.v = v
+    }
+    func get(self) {
+        return self.v
+    }
+}
+a = Box(1)
+b = Box(2)
+print(a.get())
+print(b.get())
+''', '1\n2\n'),
+}
+
+
+def execute_twice(tree):
+    # nothing has to be left in the tree by the first run
+    for _ in range(2):
+        main_context.clear()
+        execute(tree, main_context)
+
+
+def run_twice(source, optimize):
+    optimizer.enabled = optimize
+    main_context.clear()
+    tree = semantic.parse(main_context, execute, evaluate, Lexer(source).parse())
+    optimizer.optimize(tree, main_context)
+
+    return get_output(execute_twice, tree)
+
+
+for name, (source, expected_output) in sources.items():
+    outputs = {optimize: run_twice(source, optimize) for optimize in (True, False)}
+    failed = {optimize: output for optimize, output in outputs.items() if output != expected_output * 2}
+    print(name, 'passed' if not failed else f'failed (outputs: {failed!r}, should be: {expected_output * 2!r})')
+
+optimizer.enabled = True
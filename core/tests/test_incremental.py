@@ -0,0 +1,106 @@
+from os import listdir
+from time import perf_counter
+
+from core.lexer.lexer import Lexer
+from core.semantic import semantic
+from core.semantic.incremental import IncrementalParser
+from core.interpreter.eval import evaluate
+from core.interpreter.interpreter import execute
+from core.utils.contexts import Context
+from core.utils.tools import NOT_TREE_ATTRIBUTES
+
+
+def as_comparable(tree):
+    if isinstance(tree, (str, int, float, bool, type(None))):
+        return tree
+    if isinstance(tree, (list, tuple)):
+        return [as_comparable(item) for item in tree]
+    if isinstance(tree, dict):
+        return [(as_comparable(key), as_comparable(value)) for key, value in tree.items()]
+
+    if hasattr(tree, '__dict__'):
+        attributes = vars(tree)
+    else:
+        attributes = [slot for cls in type(tree).__mro__ for slot in getattr(cls, '__slots__', ())]
+
+    return type(tree).__name__, [(attribute, as_comparable(getattr(tree, attribute, None)))
+                                 for attribute in attributes if attribute not in NOT_TREE_ATTRIBUTES]
+
+
+def parse_whole(context, source):
+    try:
+        return as_comparable(semantic.parse(context, execute, evaluate, Lexer(source).parse()))
+    except Exception as exc:
+        return exc.__class__.__name__, str(exc)
+
+
+def parse_incremental(parser, change, *args):
+    try:
+        change(*args)
+        return as_comparable(parser.tree)
+    except Exception as exc:
+        return exc.__class__.__name__, str(exc)
+
+
+def compare(name, source):
+    context = Context()
+    parser = IncrementalParser(context, execute, evaluate)
+    lines = source.split('\n')
+    passed = True
+
+    # typing the source line by line
+    for index, line in enumerate(lines):
+        incremental = parse_incremental(parser, parser.replace_lines, index, index + (index == 0), [line])
+        passed &= incremental == parse_whole(context, '\n'.join(lines[:index + 1]))
+
+    # typing a character at the beginning of every line, and removing it
+    for index, line in enumerate(lines):
+        for text, end in (('(', 0), ('', 1)):
+            incremental = parse_incremental(parser, parser.edit, (index, 0), (index, end), text)
+            passed &= incremental == parse_whole(context, parser.source)
+
+    # removing lines from the middle
+    while len(parser.lines) > 1:
+        index = len(parser.lines) // 2
+        incremental = parse_incremental(parser, parser.replace_lines, index, index + 1, [])
+        passed &= incremental == parse_whole(context, parser.source)
+
+    print(name, 'passed' if passed else 'failed')
+
+
+for example in listdir('./examples/'):
+    with open('./examples/' + example) as example_fd:
+        compare(example, example_fd.read())
+
+# body, that is parsed when it is used first, is moved with the chunk even if it is parsed before an edit
+lazy_parser = IncrementalParser(Context(), execute, evaluate, '''x = 1
+func f(a, b) {
+    c = a + b
+    d = c * 2
+    e = d - 1
+    g = e + c
+    return g
+}
+''')
+lazy_parser.tree[1].code
+lazy_parser.edit((0, 0), (0, 0), 'y = 2\n')
+lines = [statement.lineno for statement in lazy_parser.tree[2].code]
+print('parsed lazy body', 'passed' if lines == [4, 5, 6, 7, 8] else f'failed: lines {lines}')
+
+with open('./examples/simple_program_demo.lt') as example_fd:
+    big_source = example_fd.read() * 500
+
+big_context = Context()
+begin = perf_counter()
+big_parser = IncrementalParser(big_context, execute, evaluate, big_source)
+print('lines:', len(big_parser.lines), 'full parse:', round(perf_counter() - begin, 3))
+
+begin = perf_counter()
+big_parser.edit((1000, 0), (1000, 0), 'x = 5 ')
+print('single line edit:', round(perf_counter() - begin, 4))
+
+begin = perf_counter()
+big_parser.edit((1000, 0), (1000, 0), 'y = 1\n')
+print('inserted line:', round(perf_counter() - begin, 4))
+print('big source', 'passed' if as_comparable(big_parser.tree) == parse_whole(big_context, big_parser.source)
+      else 'failed')
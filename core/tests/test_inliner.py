@@ -0,0 +1,66 @@
+from core.tests.tools import run, get_changes
+from core.utils.contexts import main_context
+
+# source: output, number of inlined calls
+sources = {
+    'arguments': ('''
+func five() {
+    return 5
+}
+func mix(a, b) {
+    return (a + b) * a - b
+}
+n = 4
+print(five())
+m = mix(n, 2)
+print(m)
+print(mix(n + 1, -3))
+''', '5\n22\n13\n', 2),
+    'calls in functions': ('''
+func square(x) {
+    return x * x
+}
+func area(side) {
+    return square(side)
+}
+print(area(7))
+''', '49\n', 2),
+    'not inlined': ('''
+func late(x) {
+    return early(x)
+}
+func early(x) {
+    return x + 1
+}
+func redefined() {
+    return 1
+}
+func redefined() {
+    return 2
+}
+func unused(x) {
+    return 3
+}
+func double(x) {
+    return x + x
+}
+print(late(1))
+print(redefined())
+print(unused(1))
+k = 1
+print(double(k + 2))
+''', '2\n2\n3\n6\n', 0),
+}
+
+
+for name, (source, expected_output, expected_inlined) in sources.items():
+    output = run(source)
+    # calls in functions are inlined only in the main program
+    main_context.clear()
+    inlined = sum('inlined' in change for change in get_changes(source, main_context))
+
+    if output != expected_output:
+        print(name, f'failed (output: {output!r}, should be: {expected_output!r})')
+    else:
+        print(name, 'passed' if inlined == expected_inlined else
+              f'failed (inlined calls: {inlined}, should be: {expected_inlined})')
@@ -0,0 +1,87 @@
+from time import perf_counter
+
+from core.lexer.lexer import Lexer
+from core.semantic import semantic, parsers
+from core.interpreter.eval import evaluate
+from core.interpreter.interpreter import interpret, execute
+from core.utils.contexts import Context
+from core.tests.tools import get_output
+
+source = '''
+func used(n) {
+    total = 0
+    for (i = 0; i < n; i = i + 1) {
+        total = total + i * 2
+    }
+    return total
+}
+func unused(n) {
+    total = 0
+    while (n > 0) {
+        total = total + n
+        n = n - 1
+    }
+    elif (n > 0) {
+        total = 0
+    }
+    return total
+}
+class Point {
+    func __init__(self, x, y) {
+        self.x = x
+        self.y = y
+        self.sum = x + y
+    }
+}
+print(used(10))
+p = Point(1, 2)
+print(p.sum)
+'''
+
+
+def parse(eager):
+    parsers.eager_bodies = eager
+
+    try:
+        return semantic.parse(Context(), execute, evaluate, Lexer(source).parse())
+    finally:
+        parsers.eager_bodies = False
+
+
+def interpret_or_print_error(source):
+    try:
+        interpret(source, exit_after_execution=False)
+    except Exception as exc:
+        print(exc.__class__.__name__)
+
+
+def run(eager):
+    parsers.eager_bodies = eager
+
+    try:
+        return get_output(interpret_or_print_error, source)
+    finally:
+        parsers.eager_bodies = False
+
+
+tree = parse(eager=False)
+print('bodies are not parsed', 'passed' if all(node.lazy_body is not None for node in tree[:3]) else 'failed')
+print('body is parsed once', 'passed' if tree[0].code is tree[0].code and tree[0].lazy_body is None else 'failed')
+print('unused syntax error is not raised', 'passed' if run(eager=False) == '90\n3\n' else 'failed')
+
+try:
+    parse(eager=True)
+    print('eager parse finds syntax error failed')
+except Exception:
+    print('eager parse finds syntax error passed')
+
+module = source.replace('elif', 'if') * 200
+
+for eager in (True, False):
+    parsers.eager_bodies = eager
+    lexemes = Lexer(module).parse()
+    begin = perf_counter()
+    semantic.parse(Context(), execute, evaluate, lexemes)
+    print(f'{"eager" if eager else "lazy"} parse of {len(module.splitlines())} lines: {perf_counter() - begin:.3f}s')
+
+parsers.eager_bodies = False
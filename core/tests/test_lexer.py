@@ -0,0 +1,79 @@
+from os import listdir
+from mmap import mmap, ACCESS_READ
+
+from core.lexer.lexer import Lexer
+
+
+sources = (
+    "a.b.c(1, x=2)\n\n  y = [1, [2, 3], {'a': (1, 2)}]",
+    "x = !!-5\ny=-+-x",
+    "'a\\'b' + \"c\"",
+    "a >>= 2 ** -3 // 1.5e3",
+    "f().x + .5 +.5.6",
+    "'multi\nline' x\ny",
+    "!==!===<<=**=//=",
+)
+
+
+def as_comparable(token):
+    if isinstance(token, list):
+        return [as_comparable(item) for item in token]
+    if not hasattr(token, 'as_json'):
+        return repr(token)
+
+    value = token.value
+
+    if isinstance(value, list):
+        value = as_comparable(value)
+    elif isinstance(value, dict):
+        value = [(as_comparable(key), as_comparable(val)) for key, val in value.items()]
+
+    return token.type, token.primary_type, value, token.unary, token.exclam, token.lineno, token.priority
+
+
+def compare(name, source):
+    legacy = as_comparable(Lexer(legacy=True).parse(source))
+    regex_based = as_comparable(Lexer().parse(source))
+    print(name, 'passed' if legacy == regex_based else 'failed')
+
+
+def compare_stream(name, source_fd):
+    source = source_fd.read()
+
+    if isinstance(source, bytes):
+        source = source.decode()
+
+    source_fd.seek(0)
+    whole = as_comparable(Lexer(source).parse())
+    streamed = as_comparable(list(Lexer().parse_stream(source_fd)))
+    print(name, '(stream)', 'passed' if whole == streamed else 'failed')
+
+
+def compare_parallel(name, source):
+    sequential = as_comparable(Lexer(source, parallel_threshold=None).parse())
+    parallel = as_comparable(Lexer(source, parallel_threshold=0, workers=4).parse())
+    print(name, '(parallel)', 'passed' if sequential == parallel else 'failed')
+
+
+for source in sources:
+    compare(repr(source), source)
+
+for example in listdir('./examples/'):
+    with open('./examples/' + example) as example_fd:
+        compare(example, example_fd.read())
+
+for example in listdir('./examples/'):
+    with open('./examples/' + example) as example_fd:
+        compare_stream(example, example_fd)
+
+with open('./examples/arithmetic.lt', 'rb') as example_fd, mmap(example_fd.fileno(), 0, access=ACCESS_READ) as mapped:
+    compare_stream('arithmetic.lt (mmap)', mapped)
+
+all_examples = ''
+for example in sorted(listdir('./examples/')):
+    with open('./examples/' + example) as example_fd:
+        all_examples += example_fd.read() + '\n'
+
+compare_parallel('all examples', all_examples)
+# pieces begin inside of a string and braces, so the source is lexed sequentially
+compare_parallel('multiline string', "x = '\n" + 'y = 1\n' * 50 + "'\nz = (\n" + 'w\n' * 50 + ')')
@@ -0,0 +1,75 @@
+import os
+from time import perf_counter
+from tempfile import TemporaryDirectory
+
+from core.interpreter import ltcache
+from core.interpreter.interpreter import interpret
+from core.utils.contexts import Context, main_context
+
+
+def run(path, context=None):
+    context = Context() if context is None else context
+
+    with open(path) as fd:
+        begin = perf_counter()
+        interpret(fd, context=context, exit_after_execution=False, file=path)
+
+    return context['result'], perf_counter() - begin
+
+
+def run_main(path):
+    with open(path) as fd:
+        interpret(fd, exit_after_execution=False, file=path)
+
+    return main_context.variables.get('result')
+
+
+# a lot of functions, that are defined, but never called, so parsing takes all the time
+big_source = ''.join(f'''
+func function_{index}(a, b) {{
+    c = [a, b, {{'a': 1, 'b': 2}}]
+
+    if (a > b) {{
+        print(c, a - b)
+    }} else {{
+        return a * b + (a - b) ** 2
+    }}
+}}
+''' for index in range(1000))
+
+with TemporaryDirectory() as directory:
+    source_path = os.path.join(directory, 'program.lt')
+
+    with open(source_path, 'w') as source_fd:
+        source_fd.write('func f(x) {\n    return x * 2\n}\n\nresult = f(21)\n')
+
+    print('cold:', run(source_path)[0])
+    print('cache written:', os.path.exists(ltcache.get_cache_path(source_path)))
+    print('cached:', run(source_path)[0])
+
+    with open(source_path, 'w') as source_fd:
+        source_fd.write('result = 5 + 5\n')
+
+    print('after change:', run(source_path)[0])
+
+    with open(ltcache.get_cache_path(source_path), 'wb') as cache_fd:
+        cache_fd.write(b'broken')
+
+    print('broken cache:', run(source_path)[0])
+
+    with open(source_path, 'w') as source_fd:
+        source_fd.write(big_source + '\nresult = 1\n')
+
+    cold_time, cached_time = run(source_path)[1], run(source_path)[1]
+    print('lines:', big_source.count('\n'), 'cold:', round(cold_time, 3), 'cached:', round(cached_time, 3))
+
+    # calls in functions are inlined only in the main program, so its tree is not reused by an import
+    with open(os.path.join(directory, 'lib.lt'), 'w') as lib_fd:
+        lib_fd.write('func helper() {\n    return 1\n}\nfunc g() {\n    return helper()\n}\n')
+
+    with open(source_path, 'w') as source_fd:
+        source_fd.write(f'func helper() {{\n    return 2\n}}\nimport "{os.path.join(directory, "lib")}" as lib\n'
+                        'result = lib.g()\n')
+
+    run_main(os.path.join(directory, 'lib.lt'))
+    print('imported after run as main:', run_main(source_path))
@@ -0,0 +1,57 @@
+from core.tests.tools import run
+
+sources = {
+    'locals and globals': '''
+x = 10
+func shadow() {
+    print(x)
+    x = 5
+    print(x)
+    print = 3
+    return print
+}
+shadow()
+print(x)
+''',
+    'exec in function': '''
+func run() {
+    y = 1
+    exec "z = y + 1"
+    exec "y = 7"
+    print(y, z)
+}
+run()
+''',
+    'methods and nested functions': '''
+x = 1
+class Point {
+    func __init__(self, a) {
+        self.a = a
+        b = a * 2
+        self.b = b
+    }
+    func sum(self) {
+        return self.a + self.b
+    }
+}
+
+func outer(n) {
+    func inner(m) {
+        return m + x
+    }
+    p = Point(n)
+    print(inner(n), p.sum(), p.a)
+
+    for (i = 0; i < 3; i = i + 1) {
+        n = n + i
+    }
+    print(n, i)
+}
+outer(4)
+''',
+}
+
+
+for name, source in sources.items():
+    resolved, not_resolved = run(source), run(source, optimize=False)
+    print(name, 'passed' if resolved == not_resolved else f'failed (output: {resolved!r}, should be: {not_resolved!r})')
@@ -0,0 +1,67 @@
+from io import StringIO
+from contextlib import redirect_stdout
+
+from core.interpreter import optimizer
+from core.interpreter.interpreter import interpret, execute
+from core.interpreter.eval import evaluate
+from core.semantic import semantic, parsers
+from core.lexer.lexer import Lexer
+from core.utils.contexts import Context
+
+"""
+helpers of the tests, that run the same source in a few ways (for example, with and
+without optimizations) and compare what it prints
+"""
+
+
+def get_output(function, *args):
+    """
+    returns what function(*args) prints
+    """
+
+    output = StringIO()
+
+    with redirect_stdout(output):
+        function(*args)
+
+    return output.getvalue()
+
+
+def interpret_source(source):
+    try:
+        interpret(source, exit_after_execution=False)
+    except SystemExit:
+        pass    # error is already printed
+
+
+def run(source, optimize=True):
+    """
+    returns output of the source, error included
+    """
+
+    optimizer.enabled = optimize
+
+    try:
+        return get_output(interpret_source, source)
+    finally:
+        optimizer.enabled = True
+
+
+def get_changes(source, context=None):
+    """
+    returns descriptions of changes, the optimizer makes in the source. Bodies are parsed
+    at once, as changes of bodies, that are parsed lazily, are made only when they are used
+    """
+
+    if context is None:
+        context = Context()
+
+    changes = []
+    optimizer.enabled = parsers.eager_bodies = True
+
+    try:
+        optimizer.optimize(semantic.parse(context, execute, evaluate, Lexer(source).parse()), context, changes)
+    finally:
+        parsers.eager_bodies = False
+
+    return changes
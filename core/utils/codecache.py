@@ -0,0 +1,104 @@
+import os
+from collections import OrderedDict
+
+from core.utils.tools import tree_children
+from core.utils.tokentypes import DICT
+
+"""
+Cache of trees of code, that is given to exec and eval as a string, so the same code is
+lexed and parsed once instead of every time it is executed (for example, by a loop).
+Cache keeps the recently used trees by their source, and the least recently used one is
+dropped, when there are more of them than the size of the cache. Size is set by the
+LOTUSCODECACHESIZE environment variable, 0 turns the cache off.
+
+Tree is executed as many times as it is taken from the cache, so nothing changes it
+while executing. Code with dict literals is not cached, as their values are evaluated
+while the code is parsed
+"""
+
+DEFAULT_SIZE = 256
+
+
+class CodeCache:
+    def __init__(self, size=DEFAULT_SIZE):
+        self.size = size
+        # source: tree, the least recently used go first
+        self.trees = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, source):
+        """
+        returns tree of the source, or None if it is not cached
+        """
+
+        tree = self.trees.get(source)
+
+        if tree is None:
+            self.misses += 1
+            return None
+
+        self.trees.move_to_end(source)
+        self.hits += 1
+
+        return tree
+
+    def put(self, source, tree):
+        if self.size <= 0:
+            return
+
+        self.trees[source] = tree
+        self.trees.move_to_end(source)
+
+        if len(self.trees) > self.size:
+            self.trees.popitem(last=False)
+
+    def resize(self, size):
+        self.size = size
+
+        while self.trees and len(self.trees) > max(size, 0):
+            self.trees.popitem(last=False)
+
+    def clear(self):
+        self.trees.clear()
+        self.hits = self.misses = 0
+
+
+cache = CodeCache(int(os.environ.get('LOTUSCODECACHESIZE', DEFAULT_SIZE)))
+
+
+def compile_code(source, context, semantic_parser):
+    """
+    returns tree of the code, given to exec or eval. Tree may be cached, so it must not be changed
+
+    semantic_parser: semantic_parser(tokens) returns the tree
+    """
+
+    from core.lexer.lexer import Lexer
+
+    tree = cache.get(source)
+
+    if tree is not None:
+        return tree
+
+    tokens = Lexer(source).parse(context=context)
+    cacheable = not has_dict_literals(tokens)
+    tree = semantic_parser(tokens)
+
+    if cacheable:
+        cache.put(source, tree)
+
+    return tree
+
+
+def has_dict_literals(tokens):
+    stack = [tokens]
+
+    while stack:
+        node = stack.pop()
+
+        if getattr(node, 'type', None) == DICT:
+            return True
+
+        stack.extend(tree_children(node))
+
+    return False
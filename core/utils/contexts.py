@@ -1,6 +1,11 @@
+from collections import ChainMap
+
 from lib.std.bindings import pybindings
 from core.utils.tokentypes import LIST, DICT
 
+# value of a local, that is not assigned yet
+UNBOUND = object()
+
 
 class Context:
     def __init__(self, init_vars=None):
@@ -45,27 +50,13 @@ class Context:
         else:
             variables = self.variables
 
-        value = variables[first_varpath_element]
-
-        for var in varpath:
-            if all(hasattr(value, attr) for attr in ['type', 'context']) and value.type not in (LIST, DICT):
-                value = value.context
-            elif not isinstance(value, Context):    # to support python calls
-                try:
-                    value = getattr(value, var)
-                    continue
-                except AttributeError:
-                    raise AttributeError
-
-            value = value[var]
-
-        return value
+        return get_attribute_path(variables[first_varpath_element], varpath)
 
     def items(self):
         return self.variables.items()
 
     def copy(self):
-        return Context(init_vars=self.variables.copy())
+        return Context(init_vars=dict(self.items()))
 
     def clear(self):
         self.variables = pybindings.copy()
@@ -75,18 +66,154 @@ class Context:
         isinstance(ParentContext, ChildrenContext) - shows whether ParentContext contains ChildrenContext
         """
 
-        for value in self.variables.values():
+        for _, value in self.items():
             if instance is value:
                 return True
 
         return False
 
     def __str__(self):
-        variables = {var: val for var, val in self.variables.items() if var not in pybindings}
+        variables = {var: val for var, val in self.items() if var not in pybindings}
 
         return f'Context({variables})'
 
     __repr__ = __str__
 
 
+class Frame(Context):
+    def __init__(self, local_names):
+        """
+        context of a function call. Locals, found by the resolver, are stored in a list
+        by indexes of their slots, other variables (for example, assigned by exec) are
+        stored as context stores them
+
+        local_names: {name: index of its slot}
+        """
+
+        super().__init__(ChainMap({}, pybindings))
+        self.local_names = local_names
+        self.slots = [UNBOUND] * len(local_names)
+
+    def __getitem__(self, item):
+        item_type = type(item)
+
+        if item_type is LocalName:
+            value = self.slots[item.index]
+
+            if value is not UNBOUND:
+                return value
+        elif item_type is GlobalName:
+            variables = self.variables.maps[0]
+
+            if item in variables:
+                return variables[item]
+
+            return pybindings[item] if item.builtin else main_context.variables[item]
+        elif item_type is AttributeName:
+            return get_attribute_path(self[item.root], item.path)
+
+        # local, that is not assigned yet, is looked up as any other variable
+        return self.get(item)
+
+    def __setitem__(self, key, value):
+        if type(key) is LocalName:
+            self.slots[key.index] = value
+            return
+
+        first_varpath_element, dot, _ = key.partition('.')
+        index = self.local_names.get(first_varpath_element)
+
+        if index is None:
+            return super().__setitem__(key, value)
+        if not dot:
+            self.slots[index] = value
+            return
+
+        # path of attributes of a local is set the same way context sets it
+        if self.slots[index] is UNBOUND:
+            variables = ChainMap({}, pybindings)
+        else:
+            variables = {first_varpath_element: self.slots[index]}
+
+        Context(variables)[key] = value
+        self.slots[index] = variables[first_varpath_element]
+
+    def get(self, key):
+        first_varpath_element, *varpath = key.split('.')
+        index = self.local_names.get(first_varpath_element)
+
+        if index is None or self.slots[index] is UNBOUND:
+            return super().get(key)
+
+        return get_attribute_path(self.slots[index], varpath)
+
+    def items(self):
+        local_variables = {name: self.slots[index] for name, index in self.local_names.items()
+                           if self.slots[index] is not UNBOUND}
+
+        return {**self.variables, **local_variables}.items()
+
+
+class LocalName(str):
+    """
+    name of a local variable of function, resolved to index of its slot in the frame
+    """
+
+    def __new__(cls, name, index):
+        self = super().__new__(cls, name)
+        self.index = index
+
+        return self
+
+    def __getnewargs__(self):
+        return str(self), self.index
+
+
+class GlobalName(str):
+    """
+    name, that is not a local of function, so it is looked up in builtins and the main context
+    """
+
+    def __new__(cls, name):
+        self = super().__new__(cls, name)
+        self.builtin = name in pybindings
+
+        return self
+
+    def __getnewargs__(self):
+        return str(self),
+
+
+class AttributeName(str):
+    """
+    dotted name: resolved name of the first variable, and path of attributes after it
+    """
+
+    def __new__(cls, name, root):
+        self = super().__new__(cls, name)
+        self.root = root
+        self.path = name.split('.')[1:]
+
+        return self
+
+    def __getnewargs__(self):
+        return str(self), self.root
+
+
+def get_attribute_path(value, varpath):
+    for var in varpath:
+        if all(hasattr(value, attr) for attr in ['primary_type', 'context']) and not value.type & (LIST | DICT):
+            value = value.context
+        elif not isinstance(value, Context):    # to support python calls
+            try:
+                value = getattr(value, var)
+                continue
+            except AttributeError:
+                raise AttributeError
+
+        value = value[var]
+
+    return value
+
+
 main_context = Context()
@@ -18,12 +18,25 @@ class _List:
         self.context = context
         self.value = value
         self.length = len(value)
+        # list of the tree, that is copied every time it is evaluated (see parse_list())
+        self.literal = False
 
         self.unary = '+'
 
     def contains(self, value):
         return value in [token.value for token in self.value]
 
+    def copy(self):
+        """
+        returns list with the same items and attributes, that is changed on its own
+        """
+
+        new_list = object.__new__(type(self))
+        new_list.__dict__.update(self.__dict__)
+        new_list.value = self.value.copy()
+
+        return new_list
+
     def get(self, index):
         return self.value[index]
 
@@ -46,7 +59,7 @@ class _List:
         extend_by = []
 
         for item in items:
-            if not hasattr(item, 'type') or item.type not in (LIST,):
+            if not hasattr(item, 'primary_type') or item.type != LIST:
                 raise TypeError('list can be extended only by list or tuple')
 
             extend_by.extend(item.value)
@@ -127,10 +140,19 @@ class _Dict:
         self.type = self.primary_type = DICT
         self.value = value
         self.context = context
+        # dict of the tree, that is copied every time it is evaluated (see parse_dict())
+        self.literal = False
 
     def contains(self, key):
         return key in self.value
 
+    def copy(self):
+        new_dict = object.__new__(type(self))
+        new_dict.__dict__.update(self.__dict__)
+        new_dict.value = self.value.copy()
+
+        return new_dict
+
     def get(self, item):
         return self.value[item]
 
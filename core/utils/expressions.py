@@ -0,0 +1,158 @@
+from core.utils.tokentypes import OPERATOR, PARENTHESIS, MATHEXPR, FCALL
+
+"""
+Math expression is compiled once, when it is parsed, to a tree of operations, resolved by
+priorities of operators (core/utils/priorities.py). Tree is kept flat: operations are stored
+in order of their evaluation, and every operation refers to its operands by indexes of
+values - leaves of expression come first, and result of every operation is appended after them.
+
+Operations of the higher priority are evaluated first, operations of the same priority -
+from left to right, as the stack evaluator did. Expression is still a list of its tokens,
+so everything that walks or copies tokens works with it as it did before
+
+Right operand of `&&` and `||` is evaluated only if the left one does not decide the
+value. Operations of such an expression are ordered so that the left operand of every
+operation is evaluated before the right one, right before the operation, and operations,
+nested expressions and calls of the right operand of `&&` and `||` are skipped, if it is
+not evaluated (Expression.jumps)
+"""
+
+# operators, which right operand is evaluated only if the left one does not decide the value
+SHORT_CIRCUIT_OPERATORS = ('&&', '||')
+
+
+class Expression(list):
+    __slots__ = ('leaves', 'nested', 'calls', 'operations', 'shared', 'jumps')
+
+    def __init__(self, tokens=()):
+        super().__init__(tokens)
+        self.compile()
+
+    def compile(self):
+        """
+        leaves is None if tokens are not operands, separated by operators. Such an expression
+        is evaluated by the stack evaluator, as it was
+        """
+
+        leaves, operators = self[::2], self[1::2]
+        self.leaves = self.nested = self.calls = self.operations = self.jumps = None
+        # leaves, that are evaluated once before the operations, as more than one operation uses them
+        self.shared = ()
+
+        if not leaves or len(leaves) != len(operators) + 1:
+            return
+
+        for leaf in leaves:
+            if not hasattr(leaf, 'primary_type') or leaf.primary_type & OPERATOR:
+                return
+
+        for operator in operators:
+            if not hasattr(operator, 'primary_type') or operator.primary_type != OPERATOR:
+                return
+
+        for leaf in leaves:
+            if leaf.primary_type == PARENTHESIS and type(leaf.value) is list:
+                leaf.value = Expression(leaf.value)
+
+        self.leaves = leaves
+        self.nested = [index for index, leaf in enumerate(leaves) if leaf.type == MATHEXPR]
+        self.calls = [index for index, leaf in enumerate(leaves) if leaf.primary_type == FCALL]
+        self.operations = []
+
+        # every group of already joined leaves is kept by its first leaf
+        groups = list(range(len(leaves)))
+        group_values = list(range(len(leaves)))
+
+        for operator_index in sorted(range(len(operators)), key=lambda index: -operators[index].priority):
+            left = find_group(groups, operator_index)
+            right = find_group(groups, operator_index + 1)
+            self.operations.append((group_values[left], operators[operator_index], group_values[right]))
+            groups[right] = left
+            group_values[left] = len(leaves) + len(self.operations) - 1
+
+        if any(operator.value in SHORT_CIRCUIT_OPERATORS for operator in operators):
+            self.operations = in_evaluation_order(len(leaves), self.operations)
+            self.jumps = find_jumps(self)
+            conditional = {index for jumps in self.jumps.values() for *_, indexes in jumps for index in indexes}
+            self.nested = [index for index in self.nested if index not in conditional]
+            self.calls = [index for index in self.calls if index not in conditional]
+
+
+def in_evaluation_order(leaves_count, operations):
+    """
+    returns operations, ordered so that operands of every operation are evaluated right
+    before it, the left one first. Operations refer to values by their new indexes
+    """
+
+    ordered = []
+    indexes = list(range(leaves_count)) + [None] * len(operations)
+    stack = [(leaves_count + len(operations) - 1, False)]
+
+    while stack:
+        index, operands_evaluated = stack.pop()
+
+        if index < leaves_count:
+            continue
+
+        left, op, right = operations[index - leaves_count]
+
+        if operands_evaluated:
+            ordered.append((indexes[left], op, indexes[right]))
+            indexes[index] = leaves_count + len(ordered) - 1
+        else:
+            stack.extend(((index, True), (right, False), (left, False)))
+
+    return ordered
+
+
+def find_jumps(expression):
+    """
+    returns {position of the first operation of the right operand of `&&` or `||`: [(position
+    of the `&&` or `||`, index of its left value, indexes of nested expressions and calls,
+    that are evaluated with the right operand)]}. Operations of the right operand go right
+    before their operation, and the outer operations go first
+
+    Operations must be in evaluation order (see in_evaluation_order())
+    """
+
+    leaves = expression.leaves
+    spans = [(index, index) for index in range(len(leaves))]
+    # position of the first operation of every value
+    starts = [None] * len(leaves)
+    # span of right operand: position of the first operation of it, `&&` or `||`, its left value
+    conditional = {}
+
+    for position, (left, op, right) in enumerate(expression.operations):
+        spans.append((spans[left][0], spans[right][1]))
+        starts.append(min(start for start in (starts[left], starts[right], position) if start is not None))
+
+        if op.value in SHORT_CIRCUIT_OPERATORS:
+            start = position if starts[right] is None else starts[right]
+            conditional[spans[right]] = start, position, left
+
+    jumps = {}
+    # the outer spans go first
+    ordered_spans = sorted(conditional, key=lambda span: span[0] - span[1])
+    evaluated = {span: [] for span in ordered_spans}
+
+    for index, leaf in enumerate(leaves):
+        if leaf.type == MATHEXPR or leaf.primary_type == FCALL:
+            # leaf is evaluated with the innermost right operand, it is in
+            spans_of_leaf = [span for span in ordered_spans if span[0] <= index <= span[1]]
+
+            if spans_of_leaf:
+                evaluated[spans_of_leaf[-1]].append(index)
+
+    for span in ordered_spans:
+        start, position, left = conditional[span]
+        jumps.setdefault(start, []).append((position, left, evaluated[span]))
+
+    return jumps
+
+
+def find_group(groups, index):
+    while groups[index] != index:
+        groups[index] = groups[groups[index]]
+        index = groups[index]
+
+    return index
@@ -1,20 +1,22 @@
-IF_KEYWORD = 'IF_KEYWORD'
-ELIF_KEYWORD = 'ELIF_KEYWORD'
-ELSE_KEYWORD = 'ELSE_KEYWORD'
-FOR_LOOP_KEYWORD = 'FOR_LOOP_KEYWORD'
-WHILE_LOOP_KEYWORD = 'WHILE_LOOP_KEYWORD'
-FUNCASSIGN_KEYWORD = 'FUNCASSIGN_KEYWORD'
-CLASSASSIGN_KEYWORD = 'CLASSASSIGN_KEYWORD'
-RETURN_KEYWORD = 'RETURN_KEYWORD'
-BREAK_KEYWORD = 'BREAK_KEYWORD'
-CONTINUE_KEYWORD = 'CONTINUE_KEYWORD'
-IMPORT_KEYWORD = 'IMPORT_KEYWORD'
-PYIMPORT_KEYWORD = 'PYIMPORT_KEYWORD'
-AS_KEYWORD = 'AS_KEYWORD'
-TRY_KEYWORD = 'TRY_KEYWORD'
-EXCEPT_KEYWORD = 'EXCEPT_KEYWORD'
-EXEC_KEYWORD = 'EXEC_KEYWORD'
-EVAL_KEYWORD = 'EVAL_KEYWORD'
+from core.utils.tokentypes import token_type
+
+IF_KEYWORD = token_type('IF_KEYWORD')
+ELIF_KEYWORD = token_type('ELIF_KEYWORD')
+ELSE_KEYWORD = token_type('ELSE_KEYWORD')
+FOR_LOOP_KEYWORD = token_type('FOR_LOOP_KEYWORD')
+WHILE_LOOP_KEYWORD = token_type('WHILE_LOOP_KEYWORD')
+FUNCASSIGN_KEYWORD = token_type('FUNCASSIGN_KEYWORD')
+CLASSASSIGN_KEYWORD = token_type('CLASSASSIGN_KEYWORD')
+RETURN_KEYWORD = token_type('RETURN_KEYWORD')
+BREAK_KEYWORD = token_type('BREAK_KEYWORD')
+CONTINUE_KEYWORD = token_type('CONTINUE_KEYWORD')
+IMPORT_KEYWORD = token_type('IMPORT_KEYWORD')
+PYIMPORT_KEYWORD = token_type('PYIMPORT_KEYWORD')
+AS_KEYWORD = token_type('AS_KEYWORD')
+TRY_KEYWORD = token_type('TRY_KEYWORD')
+EXCEPT_KEYWORD = token_type('EXCEPT_KEYWORD')
+EXEC_KEYWORD = token_type('EXEC_KEYWORD')
+EVAL_KEYWORD = token_type('EVAL_KEYWORD')
 
 
 keywords = {
@@ -1,3 +1,17 @@
+def square(a, b):
+    """
+    `a ** 2`, reduced by the optimizer. Integers are multiplied, as it is faster,
+    other values are powered the same way the evaluator does it
+    """
+
+    if type(a) is int:
+        return a * a
+
+    result = a ** b
+
+    return result.imag if isinstance(result, complex) else +result
+
+
 executors = {
     '+': lambda a, b: a + b,
     '-': lambda a, b: a - b,
@@ -20,7 +34,8 @@ executors = {
     '&&': lambda a, b: a and b,
     '||': lambda a, b: a or b,
     '===': lambda a, b: a is b,
-    '!==': lambda a, b: a is not b
+    '!==': lambda a, b: a is not b,
+    '**2': square,
 }
 
 characters = {
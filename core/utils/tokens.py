@@ -1,9 +1,9 @@
-from copy import deepcopy
 from types import ModuleType
 from importlib import import_module
 
-from core.utils.contexts import Context
-from core.utils.tools import create_token, process_escape_characters
+from core.utils.contexts import Context, Frame, main_context
+from core.utils.tools import create_token
+from core.utils.codecache import compile_code
 from core.utils.tokentypes import (IF_BLOCK, ELIF_BLOCK, ELSE_BLOCK,
                                    FUNCASSIGN, VARASSIGN, FCALL,
                                    BRANCH, WHILE_LOOP, FOR_LOOP,
@@ -12,10 +12,15 @@ from core.utils.tokentypes import (IF_BLOCK, ELIF_BLOCK, ELSE_BLOCK,
                                    IMPORT_STATEMENT, CLASSASSIGN, CLASSINSTANCE,
                                    LIST, TUPLE, EXECUTE_CODE, EVALUATE_CODE,
                                    STRING, PARENTHESIS, TRY_EXCEPT_BLOCK,
-                                   PYIMPORT_STATEMENT)
+                                   PYIMPORT_STATEMENT, DELETE_TEMPORARY, type_names)
+
+# kinds of arguments of a call (see FunctionCall.make_plan())
+CONSTANT_ARG, VARIABLE_ARG, EXPRESSION_ARG, EVALUATED_ARG, EXECUTED_ARG = range(5)
 
 
 class BasicToken:
+    __slots__ = ('context', 'type', 'value', 'unary', 'primary_type', 'priority', 'exclam', 'lineno')
+
     def __init__(self, context, typeof,
                  value, unary='+', exclam=False,
                  primary_type=None, lineno=None):
@@ -58,12 +63,14 @@ class BasicToken:
         except ValueError:
             value = self.value
 
-        return f'{self.primary_type or self.type}({repr(value)})'
+        return f'{type_names[self.primary_type or self.type]}({repr(value)})'
 
     __repr__ = __str__
 
 
 class FunctionCall:
+    __slots__ = ('evaluator', 'name', 'args', 'kwargs', 'unary', 'lineno', 'type', 'primary_type', 'exclam', 'plan')
+
     def __init__(self, evaluator, func_name,
                  args, kwargs, unary,
                  exclam, lineno):
@@ -76,63 +83,160 @@ class FunctionCall:
 
         self.type = self.primary_type = FCALL
         self.exclam = exclam
+        # see make_plan()
+        self.plan = None
 
     def execute(self, context):
-        func = context[self.name]
+        if self.plan is None:
+            self.plan = self.make_plan()  # made once, when the call is executed first time
+
+        simple_name, args_plan, kwargs_plan = self.plan
+
+        if simple_name and type(context) is Context:
+            # the same as context.get() does for a name without attributes
+            variables = context.variables
+            func = variables[self.name] if self.name in variables else main_context.variables[self.name]
+        else:
+            func = context[self.name]
+
         args = []
         kwargs = {}
 
-        for arg in self.args:
-            if arg.type == VARIABLE or arg.primary_type == PARENTHESIS:
-                arg_value = self.evaluator([arg], context=context)
-            elif arg.type == MATHEXPR:
+        for kind, arg in args_plan:
+            if kind == VARIABLE_ARG:
+                arg_value = context[arg.value]
+
+                if isinstance(arg_value, BasicToken):
+                    arg_value = self.evaluator([arg], context=context)
+                else:
+                    # python value is evaluated the way the evaluator does it, without a token
+                    if arg.exclam:
+                        arg_value = not arg_value
+                    if arg.unary == '-':
+                        arg_value = -arg_value
+            elif kind == CONSTANT_ARG:
+                arg_value = arg.value
+            elif kind == EXPRESSION_ARG:
                 arg_value = self.evaluator(arg.value, context)
-            elif hasattr(arg, 'execute'):
+            elif kind == EXECUTED_ARG:
                 arg_value = arg.execute(context)
             else:
-                arg_value = arg.value
+                arg_value = self.evaluator([arg], context=context)
 
             args.append(arg_value)
 
-        for kwvar, kwval in self.kwargs.items():
-            if kwval.type == VARIABLE:
+        for kwvar, is_variable, kwval in kwargs_plan:
+            if is_variable:
                 kwval = context[kwval.value]
 
             if isinstance(kwval, BasicToken):
                 kwval = kwval.value
 
-            kwargs[kwvar.value] = kwval
+            kwargs[kwvar] = kwval
 
         return func(*args, **kwargs)
 
+    def make_plan(self):
+        """
+        returns whether the name has no attributes, kind of every argument and whether every
+        keyword argument is a variable, so the call does not find them every time. Plan is made
+        when the call is executed, as the optimizer may replace arguments and names before
+        """
+
+        args_plan = []
+
+        for arg in self.args:
+            if type(arg) is BasicToken and arg.type == arg.primary_type == VARIABLE:
+                kind = VARIABLE_ARG
+            elif arg.type == VARIABLE:
+                kind = EVALUATED_ARG
+            elif arg.primary_type == PARENTHESIS:
+                kind = EVALUATED_ARG
+            elif arg.type == MATHEXPR:
+                kind = EXPRESSION_ARG
+            elif hasattr(arg, 'execute'):
+                kind = EXECUTED_ARG
+            else:
+                kind = CONSTANT_ARG
+
+            args_plan.append((kind, arg))
+
+        kwargs_plan = [(kwvar.value, kwval.type == VARIABLE, kwval) for kwvar, kwval in self.kwargs.items()]
+        simple_name = type(self.name) is str and '.' not in self.name and self.name != 'global'
+
+        return simple_name, args_plan, kwargs_plan
+
     def __str__(self):
         return f'FunctionCall(name={self.name}, args={self.args})'
 
     __repr__ = __str__
 
 
+class LazyBody:
+    __slots__ = ('parse', 'tokens', 'optimize')
+
+    def __init__(self, parse, tokens):
+        """
+        body of function or class, that is parsed when it is used first time
+
+        parse: parse(tokens) returns the statements
+        tokens: tokens of the body, as lexer gives them
+        """
+
+        self.parse = parse
+        self.tokens = tokens
+        # optimize(owner) is called after the body is parsed, if it is set by the optimizer
+        self.optimize = None
+
+    def parse_body(self, owner):
+        statements = self.parse(self.tokens)
+        owner.lazy_body = None
+        owner.parsed_body = statements
+
+        if self.optimize is not None:
+            self.optimize(owner)
+
+        return statements
+
+
 class Function:
+    __slots__ = ('executor', 'name', 'args', 'kwargs', 'parsed_body', 'lazy_body', 'lineno',
+                 'expected_args', 'type', 'primary_type', 'local_names')
+
     def __init__(self, executor, func_name, args, kwargs, code, lineno):
+        """
+        code: statements of the body, or LazyBody
+        """
+
         self.executor = executor
         self.name = func_name
         self.args = args
         self.kwargs = kwargs
-        self.code = code
-        self.extend_args = ()
+        self.parsed_body, self.lazy_body = (None, code) if isinstance(code, LazyBody) else (code, None)
         self.lineno = lineno
 
         self.expected_args = len(args)
         self.type = self.primary_type = FUNCASSIGN
+        # {name: index of slot}, if names of the body are resolved
+        self.local_names = None
 
     def __call__(self, *args, **kwargs):
-        given_args_len = len(args) + len(self.extend_args)
+        return self.call(args, kwargs)
+
+    def call(self, args, kwargs):
+        """
+        executes the body in a new context, so the function may be called by any number
+        of calls at the same time
+        """
+
+        given_args_len = len(args)
 
         if self.expected_args != given_args_len:
             raise TypeError(f'{self.name}: expected {self.expected_args} arguments, {given_args_len} got instead')
 
-        temp_context = Context()
+        temp_context = Context() if self.local_names is None else Frame(self.local_names)
 
-        for arg, given_arg in zip(self.args, self.extend_args + args):
+        for arg, given_arg in zip(self.args, args):
             temp_context[arg.value] = given_arg
 
         for default_kw_var, default_kw_val in self.kwargs.items():
@@ -151,10 +255,17 @@ class Function:
         elif executor_response.type == RETURN_STATEMENT:
             value = executor_response.value
         else:
-            raise SyntaxError('unexpected return token type: ' + executor_response.type)
+            raise SyntaxError('unexpected return token type: ' + type_names[executor_response.type])
 
         return value
 
+    @property
+    def code(self):
+        if self.lazy_body is not None:
+            return self.lazy_body.parse_body(self)
+
+        return self.parsed_body
+
     def execute(self, context):
         context[self.name] = self
 
@@ -165,17 +276,31 @@ class Function:
 
 
 class Class:
+    __slots__ = ('context', 'executor', 'name', 'parsed_body', 'lazy_body', 'lineno', 'type', 'primary_type')
+
     def __init__(self, context, executor, name, body, lineno):
+        """
+        body: statements of the body, or LazyBody
+        """
+
         self.context = context
         self.executor = executor
         self.name = name
-        self.body = self.value = body
+        self.parsed_body, self.lazy_body = (None, body) if isinstance(body, LazyBody) else (body, None)
         self.lineno = lineno
 
         self.type = self.primary_type = CLASSASSIGN
 
+    @property
+    def body(self):
+        if self.lazy_body is not None:
+            return self.lazy_body.parse_body(self)
+
+        return self.parsed_body
+
+    value = body
+
     def execute(self, context):
-        self.context = context
         context[self.name] = self
 
     def __call__(self, *init_args, **init_kwargs):
@@ -198,9 +323,9 @@ class ClassInstance:
 
         self.type = self.primary_type = CLASSINSTANCE
 
-        self.extend_all_functions_with_cls_arg()
         # this initializes instance's context (assign functions, etc.)
         executor(body, context=self.instcontext)
+        self.bind_methods()
         # finally! Time to call __init__ function
         self.init_instance()
 
@@ -224,21 +349,51 @@ class ClassInstance:
     def get_init_func(self):
         for token in self.body:
             if token.type == FUNCASSIGN and token.name == '__init__':
-                return token
+                return Method(token, self)
+
+    def bind_methods(self):
+        """
+        functions of the body are shared by all the instances, so every instance has its own
+        methods, that pass it to them
+        """
 
-    def extend_all_functions_with_cls_arg(self):
         for token in self.body:
             if token.type == FUNCASSIGN:
                 if not token.args:
                     raise SyntaxError('class method does not contains cls-method')
 
-                token.extend_args = (self,)
+                self.instcontext[token.name] = Method(token, self)
 
     def __str__(self):
         return f'ClassInstance(context={self.instcontext})'
 
 
+class Method:
+    __slots__ = ('function', 'instance', 'name', 'type', 'primary_type')
+
+    def __init__(self, function, instance):
+        """
+        function of the class body, that is called with the instance as the first argument
+        """
+
+        self.function = function
+        self.instance = instance
+        self.name = function.name
+
+        self.type = self.primary_type = FUNCASSIGN
+
+    def __call__(self, *args, **kwargs):
+        return self.function.call((self.instance, *args), kwargs)
+
+    def __str__(self):
+        return f'Method({self.function}, {self.instance})'
+
+    __repr__ = __str__
+
+
 class Branch:
+    __slots__ = ('evaluator', 'executor', 'if_expr', 'elif_exprs', 'else_expr', 'jump_table', 'type', 'primary_type')
+
     def __init__(self, executor, evaluator, if_expr, *elif_exprs, else_expr=None):
         self.evaluator = evaluator
         self.executor = executor
@@ -246,10 +401,22 @@ class Branch:
         self.if_expr = if_expr
         self.elif_exprs = list(elif_exprs)
         self.else_expr = else_expr
+        # compared variable and {constant: branch}, if every branch compares the same
+        # variable to a constant (core/interpreter/blocks.py)
+        self.jump_table = None
 
         self.type = self.primary_type = BRANCH
 
     def get_branch(self, context):
+        if self.jump_table is not None:
+            subject, branches = self.jump_table
+            value = self.evaluator(subject, context)
+
+            try:
+                return branches.get(value, self.else_expr)
+            except TypeError:
+                pass    # unhashable value is compared to every constant
+
         for branch in [self.if_expr] + self.elif_exprs:
             if self.evaluator(branch.expr, context):
                 return branch
@@ -266,8 +433,10 @@ class Branch:
 
 
 class IfBranchLeaf:
+    __slots__ = ('expr', 'code', 'lineno', 'type', 'primary_type')
+
     def __init__(self, expr, code, lineno):
-        self.expr = deepcopy(expr)
+        self.expr = expr
         self.code = code
         self.lineno = lineno
 
@@ -278,8 +447,10 @@ class IfBranchLeaf:
 
 
 class ElifBranchLeaf:
+    __slots__ = ('expr', 'code', 'lineno', 'type', 'primary_type')
+
     def __init__(self, expr, code, lineno):
-        self.expr = deepcopy(expr)
+        self.expr = expr
         self.code = code
         self.lineno = lineno
 
@@ -290,6 +461,8 @@ class ElifBranchLeaf:
 
 
 class ElseBranchLeaf:
+    __slots__ = ('code', 'lineno', 'type', 'primary_type')
+
     def __init__(self, code, lineno):
         self.code = code
         self.lineno = lineno
@@ -301,14 +474,22 @@ class ElseBranchLeaf:
 
 
 class ForLoop:
+    __slots__ = ('executor', 'evaluator', 'begin', 'end', 'step', 'code', 'hoisted', 'counter', 'lineno', 'type',
+                 'primary_type')
+
     def __init__(self, executor, evaluator, begin, end, step, code,
                  lineno):
         self.executor = executor
         self.evaluator = evaluator
         self.begin = begin
-        self.end = deepcopy(end[0].value)
+        self.end = end[0].value
         self.step = step
         self.code = code
+        # loop invariants, assigned before the first iteration (core/interpreter/blocks.py)
+        self.hoisted = None
+        # name of the counter, its bound, step and whether the bound is included, if the loop
+        # counts integers (core/interpreter/blocks.py)
+        self.counter = None
         self.lineno = lineno
 
         self.type = self.primary_type = FOR_LOOP
@@ -317,7 +498,19 @@ class ForLoop:
         # init loop
         self.begin.execute(context)
 
+        if self.counter is not None:
+            counted_range = self.get_counted_range(context)
+
+            if counted_range is not None:
+                return self.execute_counted(counted_range, context)
+
+        hoisted = self.hoisted
+
         while self.evaluator(self.end, context=context):
+            if hoisted:
+                self.executor(hoisted, context)
+                hoisted = None
+
             executor_response = self.executor(self.code, context)
 
             if executor_response is not None:
@@ -328,19 +521,66 @@ class ForLoop:
 
             self.step.execute(context)
 
+    def get_counted_range(self, context):
+        """
+        returns range of values of the counter, or None, if they are not integers
+        """
+
+        name, bound, step, inclusive = self.counter
+        start, stop = context[name], self.evaluator(bound, context=context)
+
+        if type(start) is not int or type(stop) is not int:
+            return None
+        if inclusive:
+            stop += 1 if step > 0 else -1
+
+        return range(start, stop, step)
+
+    def execute_counted(self, counted_range, context):
+        name = self.counter[0]
+        hoisted = self.hoisted
+
+        for value in counted_range:
+            context[name] = value
+
+            if hoisted:
+                self.executor(hoisted, context)
+                hoisted = None
+
+            executor_response = self.executor(self.code, context)
+
+            if executor_response is not None:
+                if executor_response.type == RETURN_STATEMENT:
+                    return executor_response
+                elif executor_response.type == BREAK_STATEMENT:
+                    return
+
+        if counted_range:
+            # value, the condition was false for
+            context[name] = counted_range[-1] + counted_range.step
+
 
 class WhileLoop:
+    __slots__ = ('executor', 'evaluator', 'expr', 'code', 'hoisted', 'lineno', 'type', 'primary_type')
+
     def __init__(self, executor, evaluator, expr, code, lineno):
         self.executor = executor
         self.evaluator = evaluator
-        self.expr = deepcopy(expr)
+        self.expr = expr
         self.code = code
+        self.hoisted = None
         self.lineno = lineno
 
         self.type = self.primary_type = WHILE_LOOP
 
     def execute(self, context):
+        hoisted = self.hoisted
+
         while self.evaluator(self.expr, context=context):
+            if hoisted:
+                self.executor(hoisted, context)
+                hoisted = None
+
             executor_response = self.executor(self.code, context=context)
 
             if executor_response is not None:
@@ -351,6 +591,8 @@ class WhileLoop:
 
 
 class VarAssign:
+    __slots__ = ('evaluator', 'name', 'value', 'lineno', 'type', 'primary_type')
+
     def __init__(self, evaluator, name, value, lineno):
         self.evaluator = evaluator
         self.name = name
@@ -372,7 +614,7 @@ class VarAssign:
             value = self.evaluator(value.value, context, return_token=True)
 
         if hasattr(self.name, 'primary_type') and self.name.type == TUPLE:
-            if value.type not in (LIST, TUPLE):
+            if not value.type & (LIST | TUPLE):
                 raise TypeError('only lists and tuples can be unpacked')
 
             to_assign = zip(self.name.value, value.value)
@@ -385,7 +627,7 @@ class VarAssign:
             elif hasattr(val, 'primary_type') and val.type == MATHEXPR:
                 val = val.value
 
-            if hasattr(val, 'primary_type') and val.type in (CLASSASSIGN, CLASSINSTANCE):
+            if hasattr(val, 'primary_type') and val.type & (CLASSASSIGN | CLASSINSTANCE):
                 result = val
             else:
                 if not isinstance(val, list):
@@ -401,7 +643,32 @@ class VarAssign:
     __repr__ = __str__
 
 
+class DeleteTemporary:
+    __slots__ = ('name', 'lineno', 'type', 'primary_type')
+
+    def __init__(self, name, lineno):
+        """
+        removes temporary of the optimizer after its last use, so it is not seen as a variable
+        of the module, and its value is not kept
+        """
+
+        self.name = name
+        self.lineno = lineno
+
+        self.type = self.primary_type = DELETE_TEMPORARY
+
+    def execute(self, context):
+        context.variables.pop(self.name, None)
+
+    def __str__(self):
+        return f'DELETE_TEMPORARY({self.name})'
+
+    __repr__ = __str__
+
+
 class ReturnStatement:
+    __slots__ = ('evaluator', 'value', 'lineno', 'type', 'primary_type', 'value_already_evaluated')
+
     def __init__(self, evaluator, value, lineno, dont_evaluate_value=False):
         self.evaluator = evaluator
         self.value = value
@@ -411,11 +678,16 @@ class ReturnStatement:
         self.value_already_evaluated = dont_evaluate_value
 
     def execute_value(self, context):
-        if not self.value_already_evaluated:
-            self.value = self.evaluator(self.value, context=context)
-            self.value_already_evaluated = True
+        """
+        returns return statement of the evaluated value. Statement of the tree is not
+        changed, as it returns a different value every time it is executed
+        """
+
+        if self.value_already_evaluated:
+            return self
 
-        return self.value
+        return ReturnStatement(self.evaluator, self.evaluator(self.value, context=context), self.lineno,
+                               dont_evaluate_value=True)
 
     def __str__(self):
         return f'RETURN({repr(self.value)})'
@@ -424,6 +696,8 @@ class ReturnStatement:
 
 
 class BreakStatement:
+    __slots__ = ('type', 'primary_type', 'lineno')
+
     def __init__(self, lineno):
         self.type = self.primary_type = BREAK_STATEMENT
         self.lineno = lineno
@@ -435,6 +709,8 @@ class BreakStatement:
 
 
 class ContinueStatement:
+    __slots__ = ('type', 'primary_type', 'lineno')
+
     def __init__(self, lineno):
         self.type = self.primary_type = CONTINUE_STATEMENT
         self.lineno = lineno
@@ -446,6 +722,8 @@ class ContinueStatement:
 
 
 class ImportStatement:
+    __slots__ = ('path', 'value', 'name', 'lineno', 'type', 'primary_type')
+
     def __init__(self, path, name, lineno):
         self.path = self.value = path + '.lt'
         self.name = name
@@ -460,6 +738,8 @@ class ImportStatement:
 
 
 class PyimportStatement:
+    __slots__ = ('path', 'value', 'name', 'lineno', 'type', 'primary_type')
+
     def __init__(self, path, name, lineno):
         self.path = self.value = path
         self.name = name
@@ -477,6 +757,8 @@ class PyimportStatement:
 
 
 class ExecuteCode:
+    __slots__ = ('executor', 'semantic_parser', 'code', 'lineno', 'type', 'primary_type')
+
     def __init__(self, executor, semantic_parser, code, lineno):
         self.executor = executor
         self.semantic_parser = semantic_parser
@@ -486,8 +768,6 @@ class ExecuteCode:
         self.type = self.primary_type = EXECUTE_CODE
 
     def execute(self, context):
-        from core.lexer.lexer import Lexer
-
         if self.code.type == STRING:
             raw_code = self.code.value
         elif self.code.type == VARIABLE:
@@ -502,13 +782,12 @@ class ExecuteCode:
             raise SyntaxError('only string can be given to exec')
 
         # raw_code now is string (I hope)
-        lexer = Lexer(process_escape_characters(raw_code))
-        code = lexer.parse(context=context)
-
-        return self.executor(self.semantic_parser(code), context=context)
+        return self.executor(compile_code(raw_code, context, self.semantic_parser), context=context)
 
 
 class EvaluateCode:
+    __slots__ = ('evaluator', 'semantic_parser', 'code', 'lineno', 'type', 'primary_type')
+
     def __init__(self, evaluator, semantic_parser, code,
                  lineno):
         self.evaluator = evaluator
@@ -519,14 +798,12 @@ class EvaluateCode:
         self.type = self.primary_type = EVALUATE_CODE
 
     def execute(self, context):
-        from core.lexer.lexer import Lexer
-
         if self.code.type == STRING:
             raw_code = self.code.value
         elif self.code.type == VARIABLE:
             raw_code = context[self.code.value]
         elif hasattr(self.code, 'execute'):
-            raw_code = self.code.execute()
+            raw_code = self.code.execute(context)
         else:
             raise TypeError('only string or variable can be given to exec')
 
@@ -535,13 +812,12 @@ class EvaluateCode:
             raise SyntaxError('only string can be given to exec')
 
         # raw_code now is string (I hope)
-        lexer = Lexer(process_escape_characters(raw_code))
-        code = lexer.parse(context=context)
-
-        return self.evaluator(self.semantic_parser(code), context=context)
+        return self.evaluator(compile_code(raw_code, context, self.semantic_parser), context=context)
 
 
 class TryExceptBlock:
+    __slots__ = ('executor', 'code', 'errhandler', 'lineno', 'type', 'primary_type')
+
     def __init__(self, executor, code, errhandler, lineno):
         self.executor = executor
         self.code = code
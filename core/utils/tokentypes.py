@@ -1,55 +1,120 @@
 from core.utils.operators import characters
 
+"""
+token types, that are joined into masks, are separate bits, so `token.type & (LIST | DICT)`
+does the same as `token.type in (LIST, DICT)`, but in a single operation. Types, that are only
+compared with ==, are numbered instead (see PACKED_BITS): there are too many of them (mostly
+operators) to give each a bit, and python ints are slower past every 30 bits. Mask types go
+in the order of how often they are checked, so the most used ones are below 30 bits.
+type_names is used to get a readable name of the type
+"""
 
-# built-in data types
-VARIABLE = 'VARIABLE'
-INTEGER = 'INTEGER'
-FLOAT = 'FLOAT'
-STRING = 'STRING'
-LIST = 'LIST'
-DICT = 'DICT'
-TUPLE = 'TUPLE'
-BOOL = 'BOOL'
-NULL = 'NULL'
-
-# high-level token types
-FCALL = 'FCALL'
-BRANCH = 'BRANCH'
-IF_BLOCK = 'IF_BLOCK'
-ELIF_BLOCK = 'ELIF_BLOCK'
-ELSE_BLOCK = 'ELSE_BLOCK'
-FOR_LOOP = 'FOR_LOOP'
-WHILE_LOOP = 'WHILE_LOOP'
-CLASSASSIGN = 'CLASSASSIGN'
-CLASSINSTANCE = 'CLASSINSTANCE'
-FUNCASSIGN = 'FUNCASSIGN'
-VARASSIGN = 'VARASSIGN'
-CODE = 'CODE'
-RETURN_STATEMENT = 'RETURN_STATEMENT'
-BREAK_STATEMENT = 'BREAK_STATEMENT'
-CONTINUE_STATEMENT = 'CONTINUE_STATEMENT'
-IMPORT_STATEMENT = 'IMPORT_STATEMENT'
-PYIMPORT_STATEMENT = 'PYIMPORT_STATEMENT'
-MODULE = 'MODULE'
-EXECUTE_CODE = 'EXECUTE_CODE'
-EVALUATE_CODE = 'EVALUATE_CODE'
-TRY_EXCEPT_BLOCK = 'TRY_EXCEPT_BLOCK'
-
-# types for lexer
-NO_TYPE = 'NO_TYPE'
-OPERATOR = 'OPERATOR'
-NEWLINE = 'NEWLINE'
-SEMICOLON = 'SEMICOLON'
-COMMA = characters[',']
-COLON = characters[':']
-POWER = characters['**']
-
-PARENTHESIS = 'PARENTHESIS'  # used for token primary-type
-BRACES = 'BRACES'    # ()
-QBRACES = 'QBRACES'  # []
-FBRACES = 'FBRACES'  # {}
-ANY = 'ANY'
-MATHEXPR = 'MATHEXPR'
+# numbered types take the low bits, mask types are the bits above them
+PACKED_BITS = 6
+PACKED_MASK = (1 << PACKED_BITS) - 1
+types = {}
+type_names = {}
+packed_count = 0
+mask_count = 0
+
+
+def token_type(name, packed=False):
+    """
+    packed: type is never a part of a mask, so it is numbered instead of getting its own bit
+    """
+
+    global packed_count, mask_count
+
+    if name not in types:
+        if packed:
+            packed_count += 1
+
+            if packed_count >= 1 << PACKED_BITS:
+                raise OverflowError('too many packed token types')
+
+            types[name] = packed_count
+        else:
+            types[name] = 1 << (PACKED_BITS + mask_count)
+            mask_count += 1
+
+        type_names[types[name]] = name
+
+    return types[name]
+
+
+def as_mask(types_):
+    if isinstance(types_, int):
+        mask = types_
+    else:
+        mask = 0
+
+        for type_ in types_:
+            mask |= type_
+
+    if mask & PACKED_MASK:
+        raise TypeError('packed token types can not be a part of a mask')
+
+    return mask
+
+
+# types joined into masks, the most checked ones first
+VARIABLE = token_type('VARIABLE')
+INTEGER = token_type('INTEGER')
+FLOAT = token_type('FLOAT')
+STRING = token_type('STRING')
+LIST = token_type('LIST')
+DICT = token_type('DICT')
+TUPLE = token_type('TUPLE')
+BOOL = token_type('BOOL')
+FCALL = token_type('FCALL')
+OPERATOR = token_type('OPERATOR')
+PARENTHESIS = token_type('PARENTHESIS')  # used for token primary-type
+MATHEXPR = token_type('MATHEXPR')
+NEWLINE = token_type('NEWLINE')
+SEMICOLON = token_type('SEMICOLON')
+NO_TYPE = token_type('NO_TYPE')
+BRACES = token_type('BRACES')    # ()
+FBRACES = token_type('FBRACES')  # {}
+RETURN_STATEMENT = token_type('RETURN_STATEMENT')
+BREAK_STATEMENT = token_type('BREAK_STATEMENT')
+CONTINUE_STATEMENT = token_type('CONTINUE_STATEMENT')
+IF_BLOCK = token_type('IF_BLOCK')
+ELIF_BLOCK = token_type('ELIF_BLOCK')
+ELSE_BLOCK = token_type('ELSE_BLOCK')
+ANY = token_type('ANY')
+CLASSASSIGN = token_type('CLASSASSIGN')
+CLASSINSTANCE = token_type('CLASSINSTANCE')
+
+# types, that are only compared
+NULL = token_type('NULL', packed=True)
+BRANCH = token_type('BRANCH', packed=True)
+FOR_LOOP = token_type('FOR_LOOP', packed=True)
+WHILE_LOOP = token_type('WHILE_LOOP', packed=True)
+FUNCASSIGN = token_type('FUNCASSIGN', packed=True)
+VARASSIGN = token_type('VARASSIGN', packed=True)
+CODE = token_type('CODE', packed=True)
+IMPORT_STATEMENT = token_type('IMPORT_STATEMENT', packed=True)
+PYIMPORT_STATEMENT = token_type('PYIMPORT_STATEMENT', packed=True)
+MODULE = token_type('MODULE', packed=True)
+EXECUTE_CODE = token_type('EXECUTE_CODE', packed=True)
+EVALUATE_CODE = token_type('EVALUATE_CODE', packed=True)
+TRY_EXCEPT_BLOCK = token_type('TRY_EXCEPT_BLOCK', packed=True)
+QBRACES = token_type('QBRACES', packed=True)  # []
+DELETE_TEMPORARY = token_type('DELETE_TEMPORARY', packed=True)
+
+# types of operator tokens (COMMA, PLUS, etc.), only those split by are masks
+MASK_OPERATORS = {'COMMA', 'COLON', 'EQUAL'}
+operators_types = {character: token_type(name, packed=name not in MASK_OPERATORS)
+                   for character, name in characters.items()}
+COMMA = operators_types[',']
+COLON = operators_types[':']
+POWER = operators_types['**']
+EQUAL = operators_types['=']
+
+# masks
+NUMBERS = INTEGER | FLOAT
+COLLECTIONS = LIST | DICT | TUPLE
+BRANCH_LEAVES = IF_BLOCK | ELIF_BLOCK | ELSE_BLOCK
 
 
 pytypes2lotus = {
@@ -1,9 +1,11 @@
-from itertools import chain
-from re import finditer
+from re import finditer, escape
 
 from core.utils.tokentypes import (NEWLINE, VARIABLE,
                                    MATHEXPR, pytypes2lotus, CLASSINSTANCE,
-                                   LIST, DICT, VARASSIGN)
+                                   LIST, DICT, VARASSIGN, as_mask)
+
+# attributes that are not a part of the tree (functions and contexts)
+NOT_TREE_ATTRIBUTES = ('context', 'executor', 'evaluator', 'semantic_parser')
 
 escape_characters = {
     '\\n': '\n',
@@ -58,54 +60,28 @@ def parse_func_args(context, args_tokens, basic_token, leave_tokens=True):
 
 
 def remove_comment(line, comment='#'):
+    """
+    quotes of the line are grouped by pairs, and a comment inside of any pair is not a comment.
+    The last quote is left without a pair, if there is an odd number of them
+    """
+
     if line.startswith(comment):
         return ''
 
-    string_pairs = get_string_pairs_indexes(line)
+    quotes_total = line.count('"') + line.count("'")
+    quotes_before = 0
 
-    for comment_index in finditer(comment, line):
-        comment_index = comment_index.start()
-
-        if comment_index not in string_pairs:
-            return line[:comment_index]
+    for match in finditer('[\'"]|' + escape(comment), line):
+        if match.group() in ('"', "'"):
+            quotes_before += 1
+        elif quotes_before % 2 == 0 or quotes_before == quotes_total:
+            return line[:match.start()]
 
     return line
 
 
-def get_string_pairs_indexes(line):
-    indexes = []
-    in_string = False
-    prev_string_opener = None
-
-    for index, letter in enumerate(line):
-        if letter in ('"', "'"):
-            if letter == prev_string_opener:
-                in_string = False
-            elif not in_string:
-                in_string = True
-                prev_string_opener = letter
-
-            indexes.append(index)
-
-    if len(indexes) % 2 != 0:
-        indexes = indexes[:-1]
-
-    return list(chain.from_iterable([range(*pair) for pair in group_by_pairs(indexes)]))
-
-
-def group_by_pairs(lst):
-    result = []
-
-    for index in range(0, len(lst), 2):
-        result.append([lst[index], lst[index + 1]])
-
-    return result
-
-
-def split_tokens(tokens, splitby=(NEWLINE,), exclude=()):
-    if not isinstance(splitby, (list, tuple)):
-        splitby = (splitby,)
-
+def split_tokens(tokens, splitby=NEWLINE, exclude=()):
+    splitby, exclude = as_mask(splitby), as_mask(exclude)
     split_tokens_result = [[]]
 
     for token in tokens:
@@ -113,10 +89,10 @@ def split_tokens(tokens, splitby=(NEWLINE,), exclude=()):
             split_tokens_result[-1].append(token)
             continue
 
-        if token.type in exclude or token.primary_type in exclude:
+        if (token.type | token.primary_type) & exclude:
             continue
 
-        if token.type in splitby or token.primary_type in splitby:
+        if (token.type | token.primary_type) & splitby:
             split_tokens_result.append([])
             continue
 
@@ -125,6 +101,22 @@ def split_tokens(tokens, splitby=(NEWLINE,), exclude=()):
     return split_tokens_result
 
 
+def split_by_indexes(tokens, indexes, exclude=()):
+    """
+    split_tokens analog, when indexes of separators are already known
+    """
+
+    bounds = [-1, *indexes, len(tokens)]
+    split_tokens_result = [tokens[start + 1:end] for start, end in zip(bounds, bounds[1:])]
+
+    if exclude:
+        exclude = as_mask(exclude)
+        split_tokens_result = [[token for token in part if not (token.type | token.primary_type) & exclude]
+                               for part in split_tokens_result]
+
+    return split_tokens_result
+
+
 def process_token(token, context):
     if token.type == VARIABLE:
         value = context[token.value]
@@ -142,9 +134,11 @@ def process_token(token, context):
     return token
 
 
-def get_token_index(list_, token_type):
-    for index, token in enumerate(list_):
-        if token_type in (token.type, token.primary_type):
+def get_token_index(list_, token_type, start=0):
+    for index in range(start, len(list_)):
+        token = list_[index]
+
+        if (token.type | token.primary_type) & token_type:
             return index
 
     return None
@@ -156,13 +150,13 @@ def readfile(path):
 
 
 def contains(source, token_type):
-    return bool([token for token in source if token_type in (token.type, token.primary_type)])
+    return any((token.type | token.primary_type) & token_type for token in source)
 
 
 def create_token(context, basic_token,
                  class_instance, value,
                  unary='+', exclam=False):
-    if hasattr(value, 'type') and value.type in (LIST, DICT):
+    if hasattr(value, 'primary_type') and value.type & (LIST | DICT):
         return value
 
     try:
@@ -181,15 +175,35 @@ def hasattrs(obj, attrs):
 
 
 def get_rid_of_tokens(tokens, get_rid_of=NEWLINE):
-    if not hasattrs(get_rid_of, '__contains__'):
-        get_rid_of = (get_rid_of,)
-
+    get_rid_of = as_mask(get_rid_of)
     output = []
 
     for token in tokens:
-        if token.type in get_rid_of:
+        if token.type & get_rid_of:
             continue
 
         output.append(token)
 
     return output
+
+
+def tree_children(node):
+    """
+    returns nodes, that the node of the semantic tree contains
+    """
+
+    if isinstance(node, (list, tuple)):
+        return node
+    if isinstance(node, dict):
+        return (*node.keys(), *node.values())
+    if not type(node).__module__.startswith('core.'):
+        return ()
+
+    if hasattr(node, '__dict__'):
+        attributes = vars(node)
+    else:
+        attributes = [slot for cls in type(node).__mro__ for slot in getattr(cls, '__slots__', ())]
+
+    # body, that is not parsed yet, has no nodes
+    return [getattr(node, attribute, None) for attribute in attributes
+            if attribute not in NOT_TREE_ATTRIBUTES and attribute != 'lazy_body']
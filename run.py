@@ -9,4 +9,4 @@ if __name__ == '__main__':
     init_paths(change_cwd=False)
 
     with open(argv[1]) as fd:
-        interpret(fd.read())
+        interpret(fd)